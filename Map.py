@@ -1,63 +1,224 @@
-import folium
-import pandas as pd
+import html
+import threading
 import os
+from utils.instrumentation import instrumentation
+
+_CLUSTER_CALLBACK = """
+function (row) {
+    var marker = L.marker(new L.LatLng(row[0], row[1]));
+    marker.bindPopup(row[2]);
+    return marker;
+}"""
+
+# Picks the finest precomputed level not above the current zoom and swaps the overlay image.
+_HEATMAP_JS = """
+(function () {
+    var map = %(map)s;
+    var levels = %(levels)s;
+    var overlay = L.imageOverlay(levels[0][1], %(bounds)s, {opacity: 0.85, interactive: false}).addTo(map);
+    function pickLevel() {
+        var zoom = map.getZoom(), url = levels[0][1];
+        levels.forEach(function (level) { if (level[0] <= zoom) { url = level[1]; } });
+        if (overlay._url !== url) { overlay.setUrl(url); }
+    }
+    map.on('zoomend', pickLevel);
+    pickLevel();
+})();
+"""
+
+# MapWidget injects the viewport layer only into pages carrying this marker.
+VIEWPORT_META = '<meta name="station-map" content="viewport">'
+# The GUI's own page, kept apart from resources/map.html, which the CLI writes by default.
+VIEWPORT_MAP_PATH = "resources/map_viewport.html"
 
 class Map:
+    __station_index_lock = threading.Lock()
+    __derived = {}
+
+    def __init__(self, stations_path="resources/stacje.txt"):
+        self.__stations_path = stations_path
+
     def load_map(self):
         self.__load_station_data()
 
-    def txt_to_html(self):
-        __geo_final_data = self.__read_txt_data()
-        latitudes, longitudes, labels = self.__extract_coordinates_and_labels(__geo_final_data)
+    def txt_to_html(self, bulk=True, output_path="resources/map.html"):
+        import folium
 
-        _PROPERTIES = "Properties"
-        _LATITUDE = "Latitude"
-        _LONGITUDE = "Longitude"
+        with instrumentation.span("map", bulk=bulk) as span:
+            stations = self.__load_stations()
+            span.set(stations=len(stations))
 
-        df = pd.DataFrame({_PROPERTIES: labels,
-                           _LATITUDE: latitudes,
-                           _LONGITUDE: longitudes})
+            m = folium.Map(location=[52, 20], tiles="OpenStreetMap", zoom_start=7)
 
-        m = folium.Map(location=[52, 20], tiles="OpenStreetMap", zoom_start=7)
+            if bulk:
+                self.__add_station_cluster(m, stations)
+            else:
+                for latitude, longitude, label in zip(stations.latitudes.tolist(), stations.longitudes.tolist(),
+                                                      stations.labels):
+                    folium.Marker(location=[latitude, longitude], popup=label).add_to(m)
 
-        for i in range(len(df)):
-            folium.Marker(
-                location=[df.iloc[i][_LATITUDE], df.iloc[i][_LONGITUDE]],
-                popup=df.iloc[i][_PROPERTIES],
-            ).add_to(m)
-        
-        click_js = """
-                function addMarker(e) {
-                    var coords = e.latlng;
-                    var marker = L.marker([coords.lat, coords.lng]).addTo(map);
-                    pyjs.handleClick(coords.lat, coords.lng);
+            m.save(output_path, close_file=False)
+            instrumentation.event("map.saved", path=output_path)
+
+    def viewport_to_html(self, output_path=VIEWPORT_MAP_PATH):
+        """Saves an empty base map; MapWidget fills in the stations of the visible area over QWebChannel."""
+        import folium
+
+        m = folium.Map(location=[52, 20], tiles="OpenStreetMap", zoom_start=7, prefer_canvas=True)
+        m.get_root().header.add_child(folium.Element(VIEWPORT_META))
+        m.save(output_path, close_file=False)
+        # Built here, off the GUI thread, so the first viewport query does not wait for it.
+        self.station_index()
+        instrumentation.event("map.saved", path=output_path)
+
+    @staticmethod
+    def is_viewport_page(path=VIEWPORT_MAP_PATH):
+        """True if path exists and was saved by viewport_to_html; the marker sits near the top of <head>."""
+        try:
+            with open(path, "r", encoding="utf-8", errors="replace") as f:
+                return VIEWPORT_META in f.read(4096)
+        except OSError:
+            return False
+
+    def station_index(self):
+        """Grid index over the stations, rebuilt only when the station file changes."""
+        from utils.station_index import StationIndex
+        return self.__derived_from_stations(
+            ("index",),
+            lambda stations: StationIndex(stations.latitudes, stations.longitudes, stations.labels))
+
+    def voivodeship_stats(self, boundaries_path=None):
+        """Per-voivodeship aggregation, recomputed only when the station or boundary file changes."""
+        from utils.voivodeship_stats import VoivodeshipStats
+        from data.voivodeships import Voivodeships
+
+        boundaries_path = boundaries_path or Voivodeships().boundaries_path
+        stamp = os.stat(boundaries_path).st_mtime_ns
+        return self.__derived_from_stations(
+            ("voivodeships", boundaries_path, stamp),
+            lambda stations: VoivodeshipStats.compute(stations.latitudes, stations.longitudes, boundaries_path))
+
+    def station_heatmap(self, cell_px=4):
+        """Density grids for the heatmap, recomputed only when the station file changes."""
+        from utils.station_heatmap import StationHeatmap
+        return self.__derived_from_stations(
+            ("heatmap", cell_px),
+            lambda stations: StationHeatmap(stations.latitudes, stations.longitudes, cell_px=cell_px))
+
+    def heatmap_to_html(self, output_path="resources/map.html", cell_px=4):
+        """Saves a map with station density drawn as one image overlay per zoom level.
+
+        The page size depends on the grid size, not on the number of stations.
+        """
+        import json
+        import folium
+        from branca.element import MacroElement
+        from jinja2 import Template
+
+        with instrumentation.span("map", heatmap=True) as span:
+            heatmap = self.station_heatmap(cell_px)
+            span.set(stations=heatmap.station_count, levels=len(heatmap.levels))
+
+            m = folium.Map(location=[52, 20], tiles="OpenStreetMap", zoom_start=6)
+            if heatmap.levels:
+                script = _HEATMAP_JS % {
+                    "map": m.get_name(),
+                    "levels": json.dumps(heatmap.data_uris()),
+                    "bounds": json.dumps(heatmap.bounds),
                 }
-                map.on('click', addMarker);
-                """
-        folium.Map.add_child(m, folium.Element(f'<script>{click_js}</script>'))
-        m.save("resources/map.html", close_file=False)
-        print("Map file generated and saved at: resources/map.html")
+                # Rendered as a child of the map so the script runs after the L.map(...) call.
+                overlay = MacroElement()
+                overlay._template = Template("{% macro script(this, kwargs) %}" + script + "{% endmacro %}")
+                m.add_child(overlay)
+            m.save(output_path, close_file=False)
+            instrumentation.event("map.saved", path=output_path)
+
+    def choropleth_to_html(self, output_path="resources/map.html", boundaries_path=None):
+        """Saves a map with one shaded polygon per voivodeship instead of station markers."""
+        import folium
+        from branca.colormap import LinearColormap
+
+        with instrumentation.span("map", choropleth=True):
+            stats = self.voivodeship_stats(boundaries_path)
+            densities = [row["density"] for row in stats.rows()]
+            colormap = LinearColormap(["#ffffcc", "#fd8d3c", "#800026"], vmin=min(densities, default=0),
+                                      vmax=max(densities, default=1),
+                                      caption="Stacje ładowania na 1000 km²")
+
+            m = folium.Map(location=[52, 20], tiles="OpenStreetMap", zoom_start=6)
+            folium.GeoJson(
+                stats.to_geojson(),
+                style_function=lambda feature: {
+                    "fillColor": colormap(feature["properties"]["density"]),
+                    "color": "#555555",
+                    "weight": 1,
+                    "fillOpacity": 0.7,
+                },
+                tooltip=folium.GeoJsonTooltip(fields=["name", "stations", "density"],
+                                              aliases=["Województwo", "Stacje", "Na 1000 km²"]),
+            ).add_to(m)
+            colormap.add_to(m)
+            m.save(output_path, close_file=False)
+            instrumentation.event("map.saved", path=output_path)
+
+    def nearest_stations(self, lat, lng, k=5):
+        index = self.station_index()
+        return index.records(*index.nearest(lat, lng, k))
+
+    def stations_within(self, lat, lng, radius_km):
+        index = self.station_index()
+        return index.records(*index.within_radius(lat, lng, radius_km))
+
+    def stations_in_view(self, south, west, north, east, limit=2000):
+        """Stations inside the bounds as [lat, lon, label] rows.
+
+        Above limit an evenly spread subset is returned; "total" always holds the full count.
+        """
+        index = self.station_index()
+        with instrumentation.span("map.viewport") as span:
+            indices = index.within_bbox(south, west, north, east)
+            total = len(indices)
+            if total > limit:
+                indices = indices[::-(-total // limit)]
+            span.set(total=total, sent=len(indices))
+            return {
+                "total": total,
+                "stations": [[lat, lon, html.escape(index.labels[i])] for i, lat, lon in zip(
+                    indices.tolist(), index.latitudes[indices].tolist(), index.longitudes[indices].tolist())],
+            }
+
+    def __add_station_cluster(self, m, stations):
+        import numpy as np
+        from folium.plugins import FastMarkerCluster
+
+        lat = np.round(stations.latitudes, 6)
+        lon = np.round(stations.longitudes, 6)
+        valid = np.isfinite(lat) & np.isfinite(lon) & (np.abs(lat) <= 90) & (np.abs(lon) <= 180)
+        if not valid.all():
+            instrumentation.count("map.invalid_stations", int(np.count_nonzero(~valid)))
+
+        popups = [html.escape(stations.labels[i]) for i in np.flatnonzero(valid).tolist()]
+        cluster = FastMarkerCluster([], callback=_CLUSTER_CALLBACK, chunkedLoading=True)
+        # Coordinates are validated above in one pass, so skip folium's per-row validation.
+        cluster.data = [list(row) for row in zip(lat[valid].tolist(), lon[valid].tolist(), popups)]
+        cluster.add_to(m)
 
     def __load_station_data(self):
-        with open("resources/stacje.txt", "r", encoding="utf-8") as f:
+        with open(self.__stations_path, "r", encoding="utf-8") as f:
             for line in f:
                 print(line.strip())
 
-    def __read_txt_data(self):
-        geo_final_data = []
-        with open("resources/stacje.txt", "r", encoding="utf-8") as f:
-            for line in f:
-                geo_final_data.append(line.split())
-        return geo_final_data
-
-    def __extract_coordinates_and_labels(self, geo_final_data):
-        latitudes = []
-        longitudes = []
-        labels = []
-
-        for latitude, longitude, *label in geo_final_data:
-            latitudes.append(latitude)
-            longitudes.append(longitude)
-            labels.append(" ".join(label))
+    def __derived_from_stations(self, key, compute):
+        stamp = (self.__stations_path, os.stat(self.__stations_path).st_mtime_ns)
+        with Map.__station_index_lock:
+            value = Map.__derived.get(stamp + key)
+            if value is None:
+                for stale in [cached for cached in Map.__derived
+                              if cached[0] == stamp[0] and cached[1] != stamp[1]]:
+                    del Map.__derived[stale]
+                value = Map.__derived[stamp + key] = compute(self.__load_stations())
+            return value
 
-        return latitudes, longitudes, labels
+    def __load_stations(self):
+        from utils.station_store import StationStore
+        return StationStore.load(self.__stations_path)
@@ -0,0 +1,133 @@
+import numpy as np
+
+# PET and DIE include their hybrids and ALT covers every other energy type, so together they are all cars.
+TOTAL_MOT_NRG = ("PET", "DIE", "ALT")
+
+
+def total_registrations(cube, countries, years=None):
+    """Masked (country, year) sum of TOTAL_MOT_NRG; masked wherever one of them is missing."""
+    return sum(cube.select(code, countries, years) for code in TOTAL_MOT_NRG)
+
+
+class CarAnalytics:
+    """Statistics over a masked (country, year) matrix of registrations, for all countries at once.
+
+    Missing cells stay masked through every calculation instead of being read as zero.
+    """
+
+    def __init__(self, counts, countries, years, totals=None):
+        self.counts = np.ma.masked_invalid(np.ma.asarray(counts, dtype=np.float64))
+        self.countries = list(countries)
+        self.years = [int(year) for year in years]
+        if not self.years:
+            raise ValueError("No years to analyse")
+        self.totals = None if totals is None else np.ma.masked_invalid(np.ma.asarray(totals, dtype=np.float64))
+
+    @classmethod
+    def from_cube(cls, cube, mot_nrg="ELC", countries=None, start_year=None, end_year=None):
+        countries = list(cube.geo if countries is None else countries)
+        years = [year for year in cube.years
+                 if (start_year is None or year >= start_year) and (end_year is None or year <= end_year)]
+        return cls(cube.select(mot_nrg, countries, years), countries, years,
+                   total_registrations(cube, countries, years))
+
+    def yoy_growth(self):
+        """Year-over-year growth as a fraction; the first year and years after a zero are masked."""
+        growth = np.ma.masked_all(self.counts.shape)
+        previous = np.ma.masked_less_equal(self.counts[:, :-1], 0)
+        growth[:, 1:] = self.counts[:, 1:] / previous - 1
+        return growth
+
+    def cagr(self):
+        """Compound annual growth between each country's first and last reported year."""
+        first, last, first_value, last_value = self.__endpoints()
+        periods = np.ma.masked_less_equal(last - first, 0)
+        ratio = last_value / np.ma.masked_less_equal(first_value, 0)
+        return np.ma.power(np.ma.masked_less(ratio, 0), 1 / periods) - 1
+
+    def share(self):
+        """Fraction of all registered cars, per country and year."""
+        if self.totals is None:
+            raise ValueError("Share needs the total registrations")
+        return self.counts / np.ma.masked_less_equal(self.totals, 0)
+
+    def ranking(self, values=None, year=None):
+        """(country, value) pairs sorted from highest to lowest, masked values left out.
+
+        values defaults to the counts; year picks a column of a (country, year) matrix.
+        """
+        values = self.counts if values is None else values
+        if np.ndim(values) == 2:
+            values = values[:, self.years.index(year if year is not None else self.years[-1])]
+        values = np.ma.asarray(values)
+        order = np.argsort(-values.filled(-np.inf), kind="stable")
+        order = order[~np.ma.getmaskarray(values)[order]]
+        return [(self.countries[i], float(values[i])) for i in order.tolist()]
+
+    def ranks(self):
+        """1-based rank of every country in every year (1 = most cars); masked where data is missing."""
+        order = np.argsort(-self.counts.filled(-np.inf), axis=0, kind="stable")
+        ranks = np.empty(self.counts.shape, dtype=np.int64)
+        np.put_along_axis(ranks, order, np.arange(1, len(self.countries) + 1)[:, None], axis=0)
+        return np.ma.MaskedArray(ranks, mask=np.ma.getmaskarray(self.counts))
+
+    def trend(self, years_ahead=3, log=False):
+        """Least-squares line per country projected years_ahead past the last year.
+
+        With log=True the line is fitted to log counts, i.e. constant growth.
+        Returns (future_years, projections); countries with fewer than two points are masked.
+        """
+        x = np.asarray(self.years, dtype=np.float64) - self.years[-1]
+        y = self.counts
+        if log:
+            y = np.ma.log(np.ma.masked_less_equal(y, 0))
+        weights = (~np.ma.getmaskarray(y)).astype(np.float64)
+        y = y.filled(0)
+
+        n = weights.sum(axis=1)
+        sx, sy = weights @ x, (weights * y).sum(axis=1)
+        sxx, sxy = weights @ (x * x), (weights * y) @ x
+        denominator = np.ma.masked_less_equal(n * sxx - sx * sx, 0)
+        slope = (n * sxy - sx * sy) / denominator
+        intercept = (sy - slope * sx) / np.ma.masked_equal(n, 0)
+
+        future = np.arange(1, years_ahead + 1, dtype=np.float64)
+        projection = intercept[:, None] + slope[:, None] * future
+        projection = np.ma.exp(projection) if log else np.ma.maximum(projection, 0)
+        return [self.years[-1] + int(step) for step in future], projection
+
+    def summary(self):
+        """One row per country with the latest count, growth, CAGR, share and next-year trend."""
+        _, last, _, last_value = self.__endpoints()
+        growth = self.yoy_growth()
+        last_growth = growth[np.arange(len(self.countries)), last]
+        share = self.share()[np.arange(len(self.countries)), last] if self.totals is not None else None
+        _, projection = self.trend(1)
+        cagr = self.cagr()
+
+        rows = []
+        for i, country in enumerate(self.countries):
+            rows.append({
+                "country": country,
+                "year": self.years[last[i]] if last_value[i] is not np.ma.masked else None,
+                "count": _value(last_value[i]),
+                "yoy_growth": _value(last_growth[i]),
+                "cagr": _value(cagr[i]),
+                "share": _value(share[i]) if share is not None else None,
+                "projection": _value(projection[i, 0]),
+            })
+        return rows
+
+    def __endpoints(self):
+        valid = ~np.ma.getmaskarray(self.counts)
+        has_data = valid.any(axis=1)
+        first = np.argmax(valid, axis=1)
+        last = valid.shape[1] - 1 - np.argmax(valid[:, ::-1], axis=1)
+        rows = np.arange(len(self.countries))
+        first_value = np.ma.MaskedArray(self.counts.filled(0)[rows, first], mask=~has_data)
+        last_value = np.ma.MaskedArray(self.counts.filled(0)[rows, last], mask=~has_data)
+        return first, last, first_value, last_value
+
+
+def _value(value):
+    return None if value is np.ma.masked else float(value)
@@ -0,0 +1,21 @@
+import contextlib
+import os
+import threading
+
+
+@contextlib.contextmanager
+def atomic_path(path):
+    """Yields a temporary path next to path and moves it over path once the block succeeds.
+
+    The caller creates the temporary file with open() rather than mkstemp, so the
+    result gets the usual umask permissions instead of 0600. On error the
+    temporary file is removed and path is left untouched.
+    """
+    tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    try:
+        yield tmp_path
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
@@ -0,0 +1,230 @@
+import argparse
+import json
+import os
+import random
+import shutil
+import sys
+import tempfile
+import time
+import tracemalloc
+
+ENERGY_TYPES = ["ALT", "BIFUEL", "BIODIE", "BIOETH", "DIE", "DIE_X_HYB", "ELC", "ELC_DIE_HYB", "ELC_DIE_PI",
+                "ELC_PET_HYB", "ELC_PET_PI", "GAS", "HYD_FCELL", "LPG", "OTH", "PET", "PET_X_HYB"]
+FLAGS = ["", "", "", "", "p", "e", "s"]
+
+QUICK_SIZES = {"geo": [40], "years": [12], "stations": [10_000], "pages": [8]}
+FULL_SIZES = {"geo": [40, 400, 4000], "years": [12, 40], "stations": [10_000, 100_000, 1_000_000], "pages": [16]}
+
+
+def geo_codes(count):
+    letters = "ABCDEFGHIJKLMNOPQRSTUVWXYZ"
+    codes = ["PL", "DE", "FR"] + [a + b for a in letters for b in letters if a + b not in ("PL", "DE", "FR")]
+    codes += [f"X{i}" for i in range(max(0, count - len(codes)))]
+    return codes[:count]
+
+
+def generate_eurostat_tsv(path, n_geo=40, n_years=12, n_energy=len(ENERGY_TYPES), first_year=2012, seed=0):
+    """Writes a road_eqr_carpda-shaped TSV (CRLF line ends, ':' gaps, status flags)."""
+    rng = random.Random(seed)
+    energies = (ENERGY_TYPES * (n_energy // len(ENERGY_TYPES) + 1))[:n_energy]
+    energies = [energy if i < len(ENERGY_TYPES) else f"{energy}_{i}" for i, energy in enumerate(energies)]
+    years = range(first_year, first_year + n_years)
+    with open(path, "w", encoding="utf-8", newline="") as f:
+        f.write("freq,unit,mot_nrg,geo\\TIME_PERIOD\t" + "\t".join(f"{year} " for year in years) + "\r\r\n")
+        for energy in energies:
+            for geo in geo_codes(n_geo):
+                cells = []
+                for _ in years:
+                    if rng.random() < 0.15:
+                        cells.append(": ")
+                    else:
+                        cells.append(f"{rng.randint(0, 600_000)} {rng.choice(FLAGS)}".rstrip() + " ")
+                f.write(f"A,NR,{energy},{geo}\t" + "\t".join(cells) + "\r\r\n")
+
+
+def generate_station_file(path, n_rows=10_000, seed=0):
+    """Writes a stacje.txt-shaped file: "lat lon address" per line, spread over Poland."""
+    rng = random.Random(seed)
+    with open(path, "w", encoding="utf-8") as f:
+        for i in range(n_rows):
+            f.write(f"{rng.uniform(49.0, 54.8):.7f} {rng.uniform(14.1, 24.1):.7f} "
+                    f"Ulica {i % 997} {i % 89}, {i % 100:02d}-{i % 1000:03d} Miasto{i % 2477}\n")
+
+
+class BenchmarkRunner:
+    def __init__(self, repeats=3):
+        self.__repeats = repeats
+        self.results = {}
+
+    def run(self, stage, name, size, func, items, unit, setup=None):
+        best_seconds = float("inf")
+        for _ in range(self.__repeats):
+            if setup is not None:
+                setup()
+            start = time.perf_counter()
+            func()
+            best_seconds = min(best_seconds, time.perf_counter() - start)
+
+        # Memory is traced in a separate run because tracemalloc slows down the timed ones.
+        if setup is not None:
+            setup()
+        tracemalloc.start()
+        func()
+        peak_bytes = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+
+        key = f"{stage}/{name}/{size}"
+        self.results[key] = {
+            "seconds": best_seconds,
+            "peak_mb": peak_bytes / 2 ** 20,
+            "throughput": items / best_seconds if best_seconds > 0 else float("inf"),
+            "unit": unit,
+        }
+        result = self.results[key]
+        print(f"{key:<45} {result['seconds'] * 1000:>10.1f} ms {result['peak_mb']:>9.1f} MB "
+              f"{result['throughput']:>14.0f} {unit}/s")
+
+
+def bench_parse(runner, sizes):
+    from utils import DataProcessor
+    from utils.eurostat_cube import EurostatCube, EurostatTable
+    from utils.eurostat_export import export_table, load_table, parquet_available
+
+    for n_geo in sizes["geo"]:
+        for n_years in sizes["years"]:
+            generate_eurostat_tsv("resources/car_stat.txt", n_geo, n_years)
+            rows = n_geo * len(ENERGY_TYPES)
+            size = f"{n_geo}geo_{n_years}y"
+
+            def legacy():
+                processor = DataProcessor()
+                processor.transform_to_dict(processor.clean_text("resources/car_stat.txt"))
+
+            # The legacy parser reads the whole file but only converts its fixed ELC slice of lines.
+            legacy_rows = len(DataProcessor().clean_text("resources/car_stat.txt"))
+            runner.run("parse", "DataProcessor", size, legacy, legacy_rows, "rows")
+            runner.run("parse", "EurostatCube", size, lambda: EurostatCube.from_tsv("resources/car_stat.txt"),
+                       rows, "rows")
+
+            table = EurostatTable.from_tsv("resources/car_stat.txt")
+            for extension in ("npz", "parquet") if parquet_available() else ("npz",):
+                export_path = export_table(table, f"resources/car_stat.{extension}")
+                runner.run("parse", f"load_table_{extension}", size, lambda: load_table(export_path), rows, "rows")
+
+
+def bench_plot(runner, sizes):
+    from utils.eurostat_cube import EurostatCube
+    from utils.plotting import GROUPED_MAX_COUNTRIES
+    from widgets.gengraph import GenGraph
+
+    # Grouped bars at the largest count "auto" still draws as bars, then every chart type at 40 countries.
+    cases = [("grouped", GROUPED_MAX_COUNTRIES), ("grouped", 40), ("stacked", 40), ("heatmap", 40)]
+    for n_geo in sizes["geo"]:
+        generate_eurostat_tsv("resources/car_stat.txt", n_geo, 12)
+        cube = EurostatCube.from_tsv("resources/car_stat.txt")
+        for chart_type, n_countries in cases:
+            countries = cube.geo[:min(n_geo, n_countries)]
+            graph = GenGraph(cube, countries, 2013, 2023, chart_type=chart_type)
+            size = f"{n_geo}geo_{len(countries)}countries"
+            runner.run("plot", f"render_{chart_type}", size, lambda: graph.render_rgba(1000, 600),
+                       len(countries) * 11, "cells" if chart_type == "heatmap" else "bars")
+
+
+def bench_map(runner, sizes):
+    from utils import Map
+    from utils.station_ingest import StationIngest
+
+    for n_rows in sizes["stations"]:
+        path = f"resources/stacje_{n_rows}.txt"
+        generate_station_file(path, n_rows)
+        runner.run("map", "station_ingest", n_rows,
+                   lambda: sum(1 for _ in StationIngest().rows(path)), n_rows, "stations")
+        runner.run("map", "txt_to_html_bulk", n_rows,
+                   lambda: Map(path).txt_to_html(output_path="resources/map.html"), n_rows, "stations")
+        if n_rows <= 10_000:
+            runner.run("map", "txt_to_html_markers", n_rows,
+                       lambda: Map(path).txt_to_html(bulk=False, output_path="resources/map.html"),
+                       n_rows, "stations")
+
+
+def bench_export(runner, sizes):
+    from utils.pdfexporter import PDFExporter
+    from utils.render_cache import render_cache
+
+    generate_eurostat_tsv("resources/car_stat.txt", 40, 12)
+    exporter = PDFExporter(None)
+    runner.run("export", "export_graph_to_pdf", 1,
+               lambda: exporter.export_graph_to_pdf(None, {"PL", "DE", "FR"}, (2013, 2023), "out/graph.pdf"),
+               1, "pages", setup=render_cache.clear)
+    for pages in sizes["pages"]:
+        specs = PDFExporter.country_specs(geo_codes(pages), [(2013, 2023)])
+        # Two workers even on a single CPU, so the process pool and the merge are measured.
+        runner.run("export", "export_report", pages,
+                   lambda: exporter.export_report(specs, "out/report.pdf", max_workers=2), pages, "pages")
+        runner.run("export", "export_report_serial", pages,
+                   lambda: exporter.export_report(specs, "out/report.pdf", max_workers=1), pages, "pages")
+
+
+STAGES = {"parse": bench_parse, "plot": bench_plot, "map": bench_map, "export": bench_export}
+
+
+def compare(results, baseline, threshold):
+    regressions = 0
+    print(f"\n{'benchmark':<45} {'baseline':>10} {'current':>10} {'change':>8}")
+    for key, result in results.items():
+        previous = baseline.get(key)
+        if previous is None:
+            print(f"{key:<45} {'-':>10} {result['seconds'] * 1000:>8.1f}ms {'new':>8}")
+            continue
+        change = (result["seconds"] - previous["seconds"]) / previous["seconds"]
+        marker = "  REGRESSION" if change > threshold else ""
+        regressions += bool(marker)
+        print(f"{key:<45} {previous['seconds'] * 1000:>8.1f}ms {result['seconds'] * 1000:>8.1f}ms "
+              f"{change:>+8.1%}{marker}")
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the parse, plot, map and export hot paths.")
+    parser.add_argument("stages", nargs="*", help=f"stages to run, any of {', '.join(STAGES)} (default: all)")
+    parser.add_argument("--quick", action="store_true", help="small sizes only")
+    parser.add_argument("--repeats", type=int, default=3)
+    parser.add_argument("--save-baseline", metavar="PATH")
+    parser.add_argument("--compare", metavar="PATH")
+    parser.add_argument("--threshold", type=float, default=0.10, help="slowdown reported as a regression")
+    args = parser.parse_args(argv)
+    unknown = [stage for stage in args.stages if stage not in STAGES]
+    if unknown:
+        parser.error(f"unknown stages: {', '.join(unknown)}")
+
+    sizes = QUICK_SIZES if args.quick else FULL_SIZES
+    runner = BenchmarkRunner(args.repeats)
+    baseline_paths = [os.path.abspath(path) if path else None for path in (args.save_baseline, args.compare)]
+
+    # Modules read resources/... relative to the working directory, so run inside a scratch tree.
+    workdir = tempfile.mkdtemp(prefix="bench-")
+    previous_cwd = os.getcwd()
+    try:
+        os.chdir(workdir)
+        os.makedirs("resources")
+        os.makedirs("out")
+        for stage in args.stages or list(STAGES):
+            STAGES[stage](runner, sizes)
+    finally:
+        os.chdir(previous_cwd)
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    save_path, compare_path = baseline_paths
+    if save_path:
+        with open(save_path, "w", encoding="utf-8") as f:
+            json.dump(runner.results, f, indent=2, sort_keys=True)
+        print(f"Baseline saved to: {save_path}")
+    if compare_path:
+        with open(compare_path, "r", encoding="utf-8") as f:
+            regressions = compare(runner.results, json.load(f), args.threshold)
+        return 1 if regressions else 0
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,234 @@
+import argparse
+import os
+import sys
+
+DATA_PATH = "resources/car_stat.txt"
+TRACE_SINKS = ("log", "memory")
+
+
+def trace_spec(value):
+    if value in TRACE_SINKS or (value.startswith("jsonl:") and len(value) > len("jsonl:")):
+        return value
+    raise argparse.ArgumentTypeError(f'expected "log", "memory" or "jsonl:<path>", got {value!r}')
+
+
+def year_window(value):
+    try:
+        start, end = (int(year) for year in value.split("-"))
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"expected START-END, e.g. 2013-2018, got {value!r}")
+    if start > end:
+        raise argparse.ArgumentTypeError(f"start year is after end year in {value!r}")
+    return start, end
+
+
+def make_parent_dir(path):
+    output_dir = os.path.dirname(path)
+    if output_dir:
+        os.makedirs(output_dir, exist_ok=True)
+
+
+def fetch(args):
+    from data.eurostat import EurostatDataFetcher
+
+    options = {"base_url": args.base_url} if args.base_url else {}
+    fetcher = EurostatDataFetcher(args.output, **options)
+    response = fetcher.get_tsv_data(args.dataset)
+    if response is None:
+        return 1
+    print("Data not modified since last download." if fetcher.not_modified else f"Data saved to: {args.output}")
+    return 0
+
+
+def fetch_many(args):
+    from data.eurostat import EurostatBatchFetcher
+
+    options = {"base_url": args.base_url} if args.base_url else {}
+    fetcher = EurostatBatchFetcher(args.output_dir, max_workers=args.workers, retries=args.retries, **options)
+    results = fetcher.fetch(args.datasets)
+    EurostatBatchFetcher.print_summary(results)
+    return 1 if any(result["status"] == "error" for result in results) else 0
+
+
+def export(args):
+    from utils.eurostat_cube import EurostatTable
+    from utils.eurostat_export import default_export_path, export_table
+
+    output = args.output or default_export_path(args.data)
+    try:
+        table = EurostatTable.from_tsv(args.data)
+        export_table(table, output)
+    except (OSError, ValueError, ImportError) as e:
+        print(f"Export failed: {e}")
+        return 1
+    print(f"Exported {len(table.labels)} series x {len(table.years)} years to: {output}")
+    return 0
+
+
+def graph(args):
+    from utils.dataset_cache import dataset_cache
+    from widgets.gengraph import GenGraph
+
+    if not os.path.exists(args.data):
+        print(f"Data file not found: {args.data}")
+        return 1
+    cube = dataset_cache.get_cube(args.data)
+    missing = [country for country in args.countries if country not in cube]
+    if missing:
+        print(f"No data for countries: {', '.join(missing)}")
+        return 1
+    if not cube.select(args.energy, args.countries, range(args.start, args.end + 1)).filled(0).any():
+        print(f"No {args.energy} data for {', '.join(args.countries)} in {args.start}-{args.end}")
+        return 1
+
+    plot = GenGraph(cube, args.countries, args.start, args.end, args.energy, args.chart)
+    make_parent_dir(args.output)
+    plot.save_plot(args.output, width=args.width, height=args.height)
+    print(f"Graph saved to: {args.output}")
+    return 0
+
+
+def map_(args):
+    from utils import Map
+
+    if not os.path.exists(args.stations):
+        print(f"Station file not found: {args.stations}")
+        return 1
+    make_parent_dir(args.output)
+    if args.choropleth:
+        if not os.path.exists(args.boundaries):
+            print(f"Boundary file not found: {args.boundaries}")
+            return 1
+        Map(args.stations).choropleth_to_html(args.output, args.boundaries)
+    elif args.heatmap:
+        Map(args.stations).heatmap_to_html(args.output)
+    else:
+        Map(args.stations).txt_to_html(bulk=not args.markers, output_path=args.output)
+    print(f"Map saved to: {args.output}")
+    return 0
+
+
+def ingest(args):
+    from utils.station_ingest import POLAND_BOUNDS
+    from utils.station_store import StationStore
+
+    if not os.path.exists(args.stations):
+        print(f"Station file not found: {args.stations}")
+        return 1
+    bounds = tuple(args.bounds) if args.bounds else POLAND_BOUNDS
+    try:
+        result = StationStore.build(args.stations, args.stations + ".store", rejected_path=args.rejected,
+                                    bounds=bounds)
+    except ValueError as e:
+        print(f"Ingest failed: {e}")
+        return 1
+    result.print_report(args.stations)
+    return 0 if result.accepted else 1
+
+
+def report(args):
+    from utils.pdfexporter import PDFExporter
+
+    if not os.path.exists(args.data):
+        print(f"Data file not found: {args.data}")
+        return 1
+    if args.countries:
+        specs = PDFExporter.country_specs(args.countries, args.windows)
+    else:
+        from utils.dataset_cache import dataset_cache
+        specs = PDFExporter.country_specs(dataset_cache.get_cube(args.data).geo, args.windows)
+
+    stats = PDFExporter(None).export_report(specs, args.output, args.energy, args.workers, summary=args.summary,
+                                            data_path=args.data)
+    return 0 if stats is not None else 1
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(description="Generate graphs, maps and reports without the GUI.")
+    parser.add_argument("--trace", metavar="SINK", type=trace_spec,
+                        help='instrumentation sink: "log", "memory" or "jsonl:<path>"')
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    fetch_parser = commands.add_parser("fetch", help="download a Eurostat dataset")
+    fetch_parser.add_argument("--dataset", default="road_eqr_carpda")
+    fetch_parser.add_argument("--output", default=DATA_PATH)
+    fetch_parser.add_argument("--base-url", default=None)
+    fetch_parser.set_defaults(func=fetch)
+
+    fetch_many_parser = commands.add_parser("fetch-many", help="download several Eurostat datasets concurrently")
+    fetch_many_parser.add_argument("datasets", nargs="+", help="dataset codes, e.g. road_eqr_carpda")
+    fetch_many_parser.add_argument("--output-dir", default="resources", help="one <code>.tsv per dataset")
+    fetch_many_parser.add_argument("--workers", type=int, default=4)
+    fetch_many_parser.add_argument("--retries", type=int, default=3)
+    fetch_many_parser.add_argument("--base-url", default=None)
+    fetch_many_parser.set_defaults(func=fetch_many)
+
+    export_parser = commands.add_parser("export", help="write the parsed dataset as Parquet or a NumPy archive")
+    export_parser.add_argument("--data", default=DATA_PATH)
+    export_parser.add_argument("--output", default=None,
+                               help="a .parquet or .npz path; defaults to Parquet when pyarrow is installed")
+    export_parser.set_defaults(func=export)
+
+    graph_parser = commands.add_parser("graph", help="render a bar chart to an image file")
+    graph_parser.add_argument("--countries", nargs="+", required=True, help="geo codes, e.g. PL DE")
+    graph_parser.add_argument("--start", type=int, required=True)
+    graph_parser.add_argument("--end", type=int, required=True)
+    graph_parser.add_argument("--energy", default="ELC", help="mot_nrg code, e.g. ELC, PET, ALT")
+    graph_parser.add_argument("--chart", default="auto", choices=["auto", "grouped", "stacked", "heatmap"],
+                              help="auto: grouped bars for a few countries, a heatmap for many")
+    graph_parser.add_argument("--data", default=DATA_PATH)
+    graph_parser.add_argument("--output", default="resources/img.png")
+    graph_parser.add_argument("--width", type=int, default=1000)
+    graph_parser.add_argument("--height", type=int, default=600)
+    graph_parser.set_defaults(func=graph)
+
+    map_parser = commands.add_parser("map", help="generate the charging station map")
+    map_parser.add_argument("--stations", default="resources/stacje.txt")
+    map_parser.add_argument("--output", default="resources/map.html")
+    map_mode = map_parser.add_mutually_exclusive_group()
+    map_mode.add_argument("--markers", action="store_true", help="one folium.Marker per station")
+    map_mode.add_argument("--heatmap", action="store_true", help="station density as an image overlay")
+    map_mode.add_argument("--choropleth", action="store_true", help="station density per voivodeship")
+    map_parser.add_argument("--boundaries", default="resources/wojewodztwa.geojson",
+                            help="voivodeship boundaries as GeoJSON")
+    map_parser.set_defaults(func=map_)
+
+    ingest_parser = commands.add_parser("ingest", help="validate and de-duplicate a station file into its store")
+    ingest_parser.add_argument("--stations", default="resources/stacje.txt")
+    ingest_parser.add_argument("--rejected", default=None, metavar="PATH", help="write every rejected row as TSV")
+    ingest_parser.add_argument("--bounds", nargs=4, type=float, metavar=("SOUTH", "WEST", "NORTH", "EAST"),
+                               help="accepted area in degrees (default: Poland with a small margin); the store "
+                                    "is rebuilt with the default the next time the map loads it")
+    ingest_parser.set_defaults(func=ingest)
+
+    report_parser = commands.add_parser("report", help="export a multi-page PDF report")
+    report_parser.add_argument("--countries", nargs="*", help="defaults to every country in the dataset")
+    report_parser.add_argument("--windows", nargs="+", required=True, type=year_window,
+                               help="year windows, e.g. 2013-2018")
+    report_parser.add_argument("--energy", default="ELC")
+    report_parser.add_argument("--data", default=DATA_PATH)
+    report_parser.add_argument("--workers", type=int, default=None)
+    report_parser.add_argument("--output", default="raport.pdf")
+    report_parser.add_argument("--summary", action="store_true", help="start with a table of growth, CAGR and share")
+    report_parser.set_defaults(func=report)
+
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    if args.command == "graph" and args.start > args.end:
+        print("End year must be greater than or equal to start year.")
+        return 1
+    if args.trace:
+        from utils.instrumentation import instrumentation
+        instrumentation.configure_from_spec(args.trace)
+        try:
+            return args.func(args)
+        finally:
+            instrumentation.flush()
+    return args.func(args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,130 @@
+import hashlib
+import os
+import threading
+import numpy as np
+from utils.atomic_file import atomic_path
+from utils.eurostat_cube import EurostatCube
+from utils.instrumentation import instrumentation
+
+
+class DatasetCache:
+    """Keeps the parsed car_stat.txt cube in memory and in a compressed .cube.npz sidecar.
+
+    The file is re-hashed only when its mtime or size changes, and re-parsed
+    only when the hash changes as well.
+    """
+
+    def __init__(self, sidecar_suffix=".npz"):
+        self.__sidecar_suffix = sidecar_suffix
+        self.__memo = {}
+        self.__lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.sidecar_loads = 0
+        self.parses = 0
+
+    def get_data(self, path, mot_nrg="ELC"):
+        """{geo: [count per year]} for one mot_nrg, read from the cached cube; missing years are 0."""
+        return self.get_cube(path).to_dict(mot_nrg)
+
+    def get_cube(self, path):
+        with self.__lock:
+            stamp = self.__stamp(path)
+            entry = self.__memo.get(path)
+            if entry is not None and entry["stamp"] == stamp:
+                self.hits += 1
+                instrumentation.count("parse.cache_hits")
+                return entry["data"]
+
+            digest = self.__file_digest(path)
+            if entry is not None and entry["digest"] == digest:
+                entry["stamp"] = stamp
+                self.hits += 1
+                instrumentation.count("parse.cache_hits")
+                return entry["data"]
+
+            self.misses += 1
+            instrumentation.count("parse.cache_misses")
+            sidecar_path = self.__sidecar_path(path)
+            with instrumentation.span("parse", target="cube") as span:
+                data = self.__load_sidecar(sidecar_path, digest)
+                span.set(source="sidecar")
+                if data is None:
+                    self.parses += 1
+                    span.set(source="text")
+                    data = self.__parse_cube(path)
+                    self.__save_sidecar(sidecar_path, digest, self.__save_cube(data))
+            self.__memo[path] = {"stamp": stamp, "digest": digest, "data": data}
+            return data
+
+    def version(self, path):
+        with self.__lock:
+            stamp = self.__stamp(path)
+            entry = self.__memo.get(path)
+            if entry is not None and entry["stamp"] == stamp:
+                return entry["digest"]
+            return self.__file_digest(path)
+
+    def invalidate(self, path=None):
+        with self.__lock:
+            if path is None:
+                self.__memo.clear()
+            else:
+                self.__memo.pop(path, None)
+
+    def stats(self):
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "sidecar_loads": self.sidecar_loads,
+            "parses": self.parses,
+        }
+
+    def __sidecar_path(self, path):
+        return f"{path}.cube{self.__sidecar_suffix}"
+
+    def __load_sidecar(self, sidecar_path, digest):
+        if not os.path.exists(sidecar_path):
+            return None
+        try:
+            with np.load(sidecar_path, allow_pickle=False) as archive:
+                if str(archive["digest"]) != digest:
+                    return None
+                data = EurostatCube.load_npz(archive)
+        except (OSError, KeyError, ValueError) as e:
+            instrumentation.event("parse.sidecar_unreadable", path=sidecar_path, error=str(e))
+            return None
+
+        self.sidecar_loads += 1
+        return data
+
+    def __save_sidecar(self, sidecar_path, digest, arrays):
+        try:
+            with atomic_path(sidecar_path) as tmp_path, open(tmp_path, "wb") as f:
+                np.savez_compressed(f, digest=np.array(digest), **arrays)
+        except OSError as e:
+            instrumentation.event("parse.sidecar_write_failed", path=sidecar_path, error=str(e))
+
+    @staticmethod
+    def __parse_cube(path):
+        return EurostatCube.from_tsv(path)
+
+    @staticmethod
+    def __save_cube(cube):
+        return cube.to_arrays()
+
+    @staticmethod
+    def __stamp(path):
+        stat = os.stat(path)
+        return stat.st_mtime_ns, stat.st_size
+
+    @staticmethod
+    def __file_digest(path):
+        sha = hashlib.sha1()
+        with open(path, "rb") as f:
+            for chunk in iter(lambda: f.read(1 << 16), b""):
+                sha.update(chunk)
+        return sha.hexdigest()
+
+
+dataset_cache = DatasetCache()
@@ -1,9 +1,39 @@
+import json
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+from utils.atomic_file import atomic_path
+from utils.instrumentation import instrumentation
+
+EUROSTAT_BASE_URL = "https://ec.europa.eu/eurostat/api/dissemination/sdmx/2.1/data"
+
+
+def create_session(pool_size=8, retries=3, backoff_factor=0.5):
+    """Session with a connection pool of pool_size and retries with exponential backoff.
+
+    Connection errors and 429/5xx responses are retried; Retry-After is honoured.
+    """
+    retry = Retry(total=retries, connect=retries, read=retries, status=retries,
+                  backoff_factor=backoff_factor, status_forcelist=(429, 500, 502, 503, 504),
+                  allowed_methods=("GET",), respect_retry_after_header=True)
+    adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size, max_retries=retry)
+    session = requests.Session()
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    return session
+
 
 class EurostatAPI:
+    def __init__(self, session=None, timeout=60):
+        self.__session = session or create_session()
+        self.__timeout = timeout
+
     def get_json_eurostat(self, indicator_code):
         try:
-            response = requests.get(f"https://api.eurostat.eu/data/{indicator_code}")
+            response = self.__session.get(f"https://api.eurostat.eu/data/{indicator_code}", timeout=self.__timeout)
             response.raise_for_status()
             return response.json()
         except requests.exceptions.RequestException as e:
@@ -13,23 +43,135 @@ class EurostatAPI:
 eurostat = EurostatAPI()
 
 class EurostatDataFetcher:
-    def __init__(self, output_file="resources/car_stat.txt"):
+    def __init__(self, output_file="resources/car_stat.txt", base_url=EUROSTAT_BASE_URL,
+                 chunk_size=64 * 1024, timeout=(10, 60), session=None):
         self.__output_file = output_file
-        self.__eurostat = EurostatAPI()
+        self.__metadata_file = output_file + ".meta.json"
+        self.__base_url = base_url.rstrip("/")
+        self.__chunk_size = chunk_size
+        self.__timeout = timeout
+        self.__session = session or create_session(pool_size=1)
+        self.not_modified = False
+        self.bytes_written = 0
+        self.error = None
+
     def get_tsv_data(self, data_name):
+        url = f"{self.__base_url}/{data_name}/?format=TSV"
+        self.not_modified = False
+        self.bytes_written = 0
+        self.error = None
+        with instrumentation.span("fetch", dataset=data_name) as span:
+            try:
+                with self.__session.get(url, headers=self.__request_headers(url), stream=True,
+                                        timeout=self.__timeout) as response:
+                    span.set(status=response.status_code)
+                    if response.status_code == 304:
+                        self.not_modified = True
+                        return response
+                    response.raise_for_status()
+                    self.bytes_written = self.__stream_to_file(response)
+                    span.set(bytes=self.bytes_written)
+                    self.__save_metadata(url, response)
+
+                return response
+
+            except requests.exceptions.RequestException as e:
+                span.set(error=type(e).__name__)
+                self.error = str(e)
+                print(f"Error fetching data: {e}")
+                return None
+            except OSError as e:
+                span.set(error=type(e).__name__)
+                self.error = str(e)
+                print(f"Error writing file: {e}")
+                return None
+
+    def __request_headers(self, url):
+        headers = {"Accept-Encoding": "gzip"}
+        metadata = self.__load_metadata()
+        if metadata.get("url") == url and os.path.exists(self.__output_file):
+            if metadata.get("etag"):
+                headers["If-None-Match"] = metadata["etag"]
+            if metadata.get("last_modified"):
+                headers["If-Modified-Since"] = metadata["last_modified"]
+        return headers
+
+    def __stream_to_file(self, response):
+        written = 0
+        with atomic_path(self.__output_file) as tmp_path:
+            with open(tmp_path, "wb") as f:
+                for chunk in response.iter_content(chunk_size=self.__chunk_size):
+                    f.write(chunk)
+                    written += len(chunk)
+        instrumentation.count("fetch.bytes", written)
+        return written
+
+    def __load_metadata(self):
         try:
-            url = f"https://ec.europa.eu/eurostat/api/dissemination/sdmx/2.1/data/{data_name}/?format=TSV"
-            response = requests.get(url)
-            response.raise_for_status()
+            with open(self.__metadata_file, "r", encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
 
-            with open(self.__output_file, "w", encoding='utf-8') as f:
-                f.write(response.text)
+    def __save_metadata(self, url, response):
+        metadata = {
+            "url": url,
+            "etag": response.headers.get("ETag"),
+            "last_modified": response.headers.get("Last-Modified"),
+        }
+        with open(self.__metadata_file, "w", encoding="utf-8") as f:
+            json.dump(metadata, f)
 
-            return response
 
-        except requests.exceptions.RequestException as e:
-            print(f"Error fetching data: {e}")
-            return None
-        except OSError as e:
-            print(f"Error writing file: {e}")
-            return None
+class EurostatBatchFetcher:
+    """Downloads several datasets at once, each to <output_dir>/<code>.tsv.
+
+    All downloads share one pooled session, and at most max_workers run at a time.
+    """
+
+    def __init__(self, output_dir="resources", base_url=EUROSTAT_BASE_URL, max_workers=4,
+                 timeout=(10, 60), retries=3, backoff_factor=0.5):
+        self.__output_dir = output_dir
+        self.__base_url = base_url
+        self.__max_workers = max_workers
+        self.__timeout = timeout
+        self.__session = create_session(max_workers, retries, backoff_factor)
+
+    def output_path(self, data_name):
+        return os.path.join(self.__output_dir, f"{data_name}.tsv")
+
+    def fetch(self, data_names):
+        """Returns one summary dict per dataset, in the order given."""
+        os.makedirs(self.__output_dir, exist_ok=True)
+        data_names = list(dict.fromkeys(data_names))
+        with instrumentation.span("fetch.batch", datasets=len(data_names), workers=self.__max_workers):
+            with ThreadPoolExecutor(max_workers=self.__max_workers) as executor:
+                return list(executor.map(self.__fetch_one, data_names))
+
+    @staticmethod
+    def print_summary(results):
+        print(f"{'dataset':<24} {'status':<13} {'bytes':>12} {'seconds':>8}")
+        for result in results:
+            print(f"{result['dataset']:<24} {result['status']:<13} {result['bytes']:>12,} "
+                  f"{result['seconds']:>8.2f}")
+        total_bytes = sum(result["bytes"] for result in results)
+        failed = sum(result["status"] == "error" for result in results)
+        print(f"{len(results)} datasets, {total_bytes:,} bytes, {failed} failed")
+
+    def __fetch_one(self, data_name):
+        fetcher = EurostatDataFetcher(self.output_path(data_name), self.__base_url,
+                                      timeout=self.__timeout, session=self.__session)
+        start = time.perf_counter()
+        response = fetcher.get_tsv_data(data_name)
+        if response is None:
+            status = "error"
+        else:
+            status = "not_modified" if fetcher.not_modified else "downloaded"
+        return {
+            "dataset": data_name,
+            "path": self.output_path(data_name),
+            "status": status,
+            "bytes": fetcher.bytes_written,
+            "seconds": time.perf_counter() - start,
+            "error": fetcher.error,
+        }
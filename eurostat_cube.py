@@ -0,0 +1,149 @@
+import numpy as np
+
+_MISSING = ":"
+
+
+def encode_labels(labels):
+    """(categories, codes) with labels == categories[codes]; codes use the smallest unsigned type that fits."""
+    categories, codes = np.unique(labels, return_inverse=True)
+    return categories, codes.reshape(np.shape(labels)).astype(np.min_scalar_type(max(len(categories) - 1, 0)))
+
+
+class EurostatTable:
+    """All rows of a Eurostat TSV: dimension labels plus (row, year) values, missing mask and flags."""
+
+    def __init__(self, dimensions, labels, years, values, missing, flags):
+        self.dimensions = list(dimensions)
+        self.labels = labels
+        self.years = years
+        self.values = values
+        self.missing = missing
+        self.flags = flags
+
+    @classmethod
+    def from_tsv(cls, path):
+        with open(path, "r", encoding="utf-8") as f:
+            lines = [line for line in f.read().splitlines() if line.strip()]
+        if len(lines) < 2:
+            raise ValueError(f"Empty Eurostat file: {path}")
+
+        header = lines[0].split("\t")
+        dimensions = header[0].split("\\")[0].split(",")
+        years = np.array([int(year.strip()) for year in header[1:]], dtype=np.int64)
+        width = len(header)
+
+        rows = [line.split("\t") for line in lines[1:]]
+        rows = [row[:width] + [_MISSING] * (width - len(row)) for row in rows]
+        labels = np.array([row[0].split(",") for row in rows], dtype=str).reshape(len(rows), len(dimensions))
+        cells = np.char.strip(np.array([row[1:] for row in rows], dtype=str).reshape(len(rows), len(years)))
+
+        parts = np.char.partition(cells, " ")
+        raw = parts[..., 0]
+        flags = np.char.strip(parts[..., 2])
+        missing = (raw == _MISSING) | (raw == "")
+        values = np.where(missing, "0", raw).astype(np.int64)
+
+        return cls(dimensions, labels, years, values, missing, flags)
+
+    def column(self, dimension):
+        return self.labels[:, self.dimensions.index(dimension)]
+
+
+class EurostatCube:
+    """Dense (mot_nrg, geo, year) view of road_eqr_carpda for a single freq/unit pair."""
+
+    def __init__(self, mot_nrg, geo, years, values, missing, flags, freq="A", unit="NR"):
+        self.mot_nrg = list(mot_nrg)
+        self.geo = list(geo)
+        self.years = [int(year) for year in years]
+        self.values = values
+        self.missing = missing
+        self.flags = flags
+        self.freq = freq
+        self.unit = unit
+        self.mot_nrg_index = {label: i for i, label in enumerate(self.mot_nrg)}
+        self.geo_index = {label: i for i, label in enumerate(self.geo)}
+        self.year_index = {year: i for i, year in enumerate(self.years)}
+
+    @classmethod
+    def from_tsv(cls, path, freq="A", unit="NR"):
+        return cls.from_table(EurostatTable.from_tsv(path), freq, unit)
+
+    @classmethod
+    def from_table(cls, table, freq="A", unit="NR"):
+        rows = np.ones(len(table.labels), dtype=bool)
+        if "freq" in table.dimensions:
+            rows &= table.column("freq") == freq
+        if "unit" in table.dimensions:
+            rows &= table.column("unit") == unit
+
+        mot_nrg, mot_nrg_pos = np.unique(table.column("mot_nrg")[rows], return_inverse=True)
+        geo, geo_pos = np.unique(table.column("geo")[rows], return_inverse=True)
+        shape = (len(mot_nrg), len(geo), len(table.years))
+
+        values = np.zeros(shape, dtype=np.int64)
+        missing = np.ones(shape, dtype=bool)
+        flags = np.full(shape, "", dtype=table.flags.dtype)
+        values[mot_nrg_pos, geo_pos] = table.values[rows]
+        missing[mot_nrg_pos, geo_pos] = table.missing[rows]
+        flags[mot_nrg_pos, geo_pos] = table.flags[rows]
+
+        return cls(mot_nrg.tolist(), geo.tolist(), table.years, values, missing, flags, freq, unit)
+
+    def __contains__(self, geo):
+        return geo in self.geo_index
+
+    def select(self, mot_nrg, geos, years=None):
+        """Returns a masked (geo, year) array; unknown geos and years come back fully masked."""
+        return np.ma.MaskedArray(*self.__take(self.values, self.missing, mot_nrg, geos, years))
+
+    def select_flags(self, mot_nrg, geos, years=None):
+        return self.__take(self.flags, self.missing, mot_nrg, geos, years)[0]
+
+    def series(self, mot_nrg, geo):
+        return self.select(mot_nrg, [geo])[0]
+
+    def to_dict(self, mot_nrg="ELC", start_year=None, end_year=None):
+        years = [year for year in self.years
+                 if (start_year is None or year >= start_year) and (end_year is None or year <= end_year)]
+        data = self.select(mot_nrg, self.geo, years).filled(0)
+        return {geo: data[i].tolist() for i, geo in enumerate(self.geo)}
+
+    def to_arrays(self):
+        """The cube as plain arrays for np.savez; flags are stored as small integer codes plus their categories."""
+        flag_categories, flag_codes = encode_labels(self.flags)
+        return {
+            "mot_nrg": np.array(self.mot_nrg, dtype=str),
+            "geo": np.array(self.geo, dtype=str),
+            "years": np.array(self.years, dtype=np.int64),
+            "values": self.values,
+            "missing": self.missing,
+            "flag_categories": flag_categories,
+            "flag_codes": flag_codes,
+            "freq": np.array(self.freq),
+            "unit": np.array(self.unit),
+        }
+
+    @classmethod
+    def load_npz(cls, archive):
+        flags = archive["flag_categories"][archive["flag_codes"]]
+        return cls(archive["mot_nrg"].tolist(), archive["geo"].tolist(), archive["years"].tolist(),
+                   archive["values"], archive["missing"], flags,
+                   str(archive["freq"]), str(archive["unit"]))
+
+    def __take(self, array, missing, mot_nrg, geos, years):
+        energy = self.mot_nrg_index.get(mot_nrg)
+        geo_pos = np.array([self.geo_index.get(geo, -1) for geo in geos], dtype=np.int64)
+        if years is None:
+            year_pos = np.arange(len(self.years))
+        else:
+            year_pos = np.array([self.year_index.get(year, -1) for year in years], dtype=np.int64)
+
+        if energy is None:
+            shape = (len(geo_pos), len(year_pos))
+            return np.zeros(shape, dtype=array.dtype), np.ones(shape, dtype=bool)
+
+        rows = np.ix_(np.maximum(geo_pos, 0), np.maximum(year_pos, 0))
+        known = (geo_pos[:, None] >= 0) & (year_pos[None, :] >= 0)
+        selected = np.where(known, array[energy][rows], np.zeros((), dtype=array.dtype))
+        return selected, missing[energy][rows] | ~known
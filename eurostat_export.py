@@ -0,0 +1,136 @@
+import importlib.util
+import json
+import os
+import numpy as np
+from utils.atomic_file import atomic_path
+from utils.eurostat_cube import EurostatTable, encode_labels
+from utils.instrumentation import instrumentation
+
+FORMAT_VERSION = 1
+EXTENSIONS = {".parquet": "parquet", ".npz": "npz"}
+
+
+def parquet_available():
+    return importlib.util.find_spec("pyarrow") is not None
+
+
+def default_export_path(data_path):
+    """data_path with its extension replaced by .parquet, or .npz when pyarrow is not installed."""
+    return os.path.splitext(data_path)[0] + (".parquet" if parquet_available() else ".npz")
+
+
+def export_table(table, path):
+    """Writes every row of an EurostatTable to path; the extension picks Parquet or a NumPy archive.
+
+    Parquet holds one row per (series, year) with the dimensions and flags
+    dictionary-encoded and missing values as nulls, so it opens directly in
+    pandas, polars or DuckDB. The .npz archive keeps the (series, year) matrices
+    and stores labels and flags as small integer codes plus their categories.
+    """
+    export_format = _format(path)
+    with instrumentation.span("export.table", format=export_format, rows=len(table.labels)):
+        with atomic_path(path) as tmp_path:
+            if export_format == "parquet":
+                _write_parquet(table, tmp_path)
+            else:
+                with open(tmp_path, "wb") as f:
+                    np.savez(f, **_to_arrays(table))
+    return path
+
+
+def load_table(path):
+    """Reads a file written by export_table back into an EurostatTable."""
+    export_format = _format(path)
+    with instrumentation.span("load.table", format=export_format):
+        if export_format == "parquet":
+            return _read_parquet(path)
+        with np.load(path, allow_pickle=False) as archive:
+            return _from_arrays(archive)
+
+
+def _format(path):
+    export_format = EXTENSIONS.get(os.path.splitext(path)[1].lower())
+    if export_format is None:
+        raise ValueError(f"Unsupported export file {path}; use one of {', '.join(EXTENSIONS)}")
+    if export_format == "parquet" and not parquet_available():
+        raise ImportError("Parquet files need pyarrow (pip install pyarrow); use an .npz path instead")
+    return export_format
+
+
+def _to_arrays(table):
+    arrays = {
+        "format_version": np.array(FORMAT_VERSION),
+        "dimensions": np.array(table.dimensions, dtype=str),
+        "years": table.years.astype(np.int16),
+        "values": table.values,
+        "missing": table.missing,
+    }
+    for i, dimension in enumerate(table.dimensions):
+        arrays[f"{dimension}_categories"], arrays[f"{dimension}_codes"] = encode_labels(table.labels[:, i])
+    arrays["flag_categories"], arrays["flag_codes"] = encode_labels(table.flags)
+    return arrays
+
+
+def _from_arrays(archive):
+    if int(archive["format_version"]) != FORMAT_VERSION:
+        raise ValueError(f"Unsupported export format version {int(archive['format_version'])}")
+    dimensions = archive["dimensions"].tolist()
+    columns = [archive[f"{dimension}_categories"][archive[f"{dimension}_codes"]] for dimension in dimensions]
+    labels = np.stack(columns, axis=1) if columns else np.empty((0, 0), dtype=str)
+    flags = archive["flag_categories"][archive["flag_codes"]]
+    return EurostatTable(dimensions, labels, archive["years"].astype(np.int64), archive["values"],
+                         archive["missing"], flags)
+
+
+def _write_parquet(table, path):
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    n_rows, n_years = table.values.shape
+    series = np.repeat(np.arange(n_rows), n_years)
+    columns = {}
+    for i, dimension in enumerate(table.dimensions):
+        categories, codes = encode_labels(table.labels[:, i])
+        columns[dimension] = pa.DictionaryArray.from_arrays(codes.astype(np.int32)[series],
+                                                           pa.array(categories.tolist(), type=pa.string()))
+    columns["year"] = pa.array(np.tile(table.years.astype(np.int16), n_rows))
+    columns["value"] = pa.array(table.values.ravel(), mask=table.missing.ravel())
+    flag_categories, flag_codes = encode_labels(table.flags.ravel())
+    columns["flag"] = pa.DictionaryArray.from_arrays(
+        pa.array(flag_codes.astype(np.int32), mask=table.flags.ravel() == ""),
+        pa.array(flag_categories.tolist(), type=pa.string()))
+
+    metadata = {"eurostat_export": json.dumps({"format_version": FORMAT_VERSION, "dimensions": table.dimensions,
+                                               "years": table.years.tolist()})}
+    pq.write_table(pa.table(columns).replace_schema_metadata(metadata), path)
+
+
+def _read_parquet(path):
+    import pyarrow.parquet as pq
+
+    arrow_table = pq.read_table(path)
+    info = json.loads((arrow_table.schema.metadata or {}).get(b"eurostat_export", b"{}"))
+    if info.get("format_version") != FORMAT_VERSION:
+        raise ValueError(f"{path} was not written by export_table")
+    dimensions = info["dimensions"]
+    years = np.array(info["years"], dtype=np.int64)
+    # Rows are written series by series, every year of a series in order.
+    n_years = len(years)
+    n_rows = arrow_table.num_rows // n_years if n_years else 0
+    shape = (n_rows, n_years)
+
+    def column(name):
+        return arrow_table.column(name).combine_chunks()
+
+    labels = np.stack([_decode(column(dimension))[::n_years] for dimension in dimensions], axis=1)
+    value = column("value")
+    missing = value.is_null().to_numpy(zero_copy_only=False).reshape(shape)
+    values = value.fill_null(0).to_numpy().astype(np.int64).reshape(shape)
+    flags = _decode(column("flag")).reshape(shape)
+    return EurostatTable(dimensions, labels, years, values, missing, flags)
+
+
+def _decode(dictionary_array):
+    """The strings of a pyarrow DictionaryArray as a NumPy array, with nulls as ""."""
+    categories = np.asarray(dictionary_array.dictionary.to_pylist() + [""], dtype=str)
+    return categories[dictionary_array.indices.fill_null(len(categories) - 1).to_numpy()]
@@ -1,5 +1,5 @@
 from utils.plotting import BasePlot
 
 class GenGraph(BasePlot):
-    def __init__(self, data, specific_countries, start_year, end_year):
-        super().__init__(data, specific_countries, start_year, end_year)
+    def __init__(self, data, specific_countries, start_year, end_year, mot_nrg="ELC", chart_type="auto"):
+        super().__init__(data, specific_countries, start_year, end_year, mot_nrg, chart_type)
@@ -0,0 +1,186 @@
+import json
+import logging
+import math
+import os
+import threading
+import time
+
+
+class MemorySink:
+    def __init__(self):
+        self.records = []
+
+    def emit(self, record):
+        self.records.append(record)
+
+
+class LogSink:
+    def __init__(self, logger_name="instrumentation", level=logging.INFO):
+        self.__logger = logging.getLogger(logger_name)
+        self.__level = level
+
+    def emit(self, record):
+        fields = " ".join(f"{key}={value}" for key, value in record.items() if key not in ("kind", "name"))
+        self.__logger.log(self.__level, "%s %s %s", record["kind"], record["name"], fields)
+
+
+class JsonLinesSink:
+    def __init__(self, path):
+        self.__path = path
+        self.__lock = threading.Lock()
+
+    def emit(self, record):
+        line = json.dumps(record, default=str)
+        with self.__lock, open(self.__path, "a", encoding="utf-8") as f:
+            f.write(line + "\n")
+
+
+class Histogram:
+    """Running count/sum/min/max plus power-of-two buckets."""
+
+    def __init__(self):
+        self.count = 0
+        self.total = 0.0
+        self.min = math.inf
+        self.max = -math.inf
+        self.buckets = {}
+
+    def observe(self, value):
+        self.count += 1
+        self.total += value
+        self.min = min(self.min, value)
+        self.max = max(self.max, value)
+        bucket = math.ceil(math.log2(value)) if value > 0 else None
+        self.buckets[bucket] = self.buckets.get(bucket, 0) + 1
+
+    def summary(self):
+        return {
+            "count": self.count,
+            "mean": self.total / self.count if self.count else 0.0,
+            "min": self.min if self.count else 0.0,
+            "max": self.max if self.count else 0.0,
+        }
+
+
+class _NullSpan:
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        return False
+
+    def set(self, **fields):
+        pass
+
+
+_NULL_SPAN = _NullSpan()
+
+
+class _Span:
+    def __init__(self, owner, name, fields):
+        self.__owner = owner
+        self.__name = name
+        self.__fields = fields
+
+    def __enter__(self):
+        self.__start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, traceback):
+        elapsed_ms = (time.perf_counter() - self.__start) * 1000
+        if exc_type is not None:
+            self.__fields["error"] = exc_type.__name__
+        self.__owner.observe(self.__name, elapsed_ms)
+        self.__owner.emit({**self.__fields, "kind": "span", "name": self.__name,
+                           "duration_ms": round(elapsed_ms, 3)})
+        return False
+
+    def set(self, **fields):
+        self.__fields.update(fields)
+
+
+class Instrumentation:
+    """Spans, counters, histograms and events sent to a pluggable sink.
+
+    Disabled until configure() is given a sink; while disabled every call
+    returns immediately and span() hands out a shared no-op context manager.
+    """
+
+    def __init__(self):
+        self.enabled = False
+        self.__sink = None
+        self.__lock = threading.Lock()
+        self.__counters = {}
+        self.__histograms = {}
+
+    def configure(self, sink=None):
+        self.__sink = sink
+        self.enabled = sink is not None
+
+    def configure_from_env(self, variable="INSTRUMENTATION_SINK"):
+        self.configure_from_spec(os.environ.get(variable, ""))
+
+    def configure_from_spec(self, value):
+        """Accepts "log", "memory" or "jsonl:<path>"; anything else leaves instrumentation untouched."""
+        if value == "log":
+            logging.basicConfig(level=logging.INFO)
+            self.configure(LogSink())
+        elif value == "memory":
+            self.configure(MemorySink())
+        elif value.startswith("jsonl:"):
+            self.configure(JsonLinesSink(value[len("jsonl:"):]))
+
+    @property
+    def sink(self):
+        return self.__sink
+
+    def span(self, name, **fields):
+        if not self.enabled:
+            return _NULL_SPAN
+        return _Span(self, name, fields)
+
+    def count(self, name, value=1):
+        if not self.enabled:
+            return
+        with self.__lock:
+            self.__counters[name] = self.__counters.get(name, 0) + value
+
+    def observe(self, name, value):
+        if not self.enabled:
+            return
+        with self.__lock:
+            histogram = self.__histograms.get(name)
+            if histogram is None:
+                histogram = self.__histograms[name] = Histogram()
+            histogram.observe(value)
+
+    def event(self, name, **fields):
+        if not self.enabled:
+            return
+        self.emit({**fields, "kind": "event", "name": name})
+
+    def emit(self, record):
+        sink = self.__sink
+        if sink is not None:
+            record.setdefault("ts", time.time())
+            sink.emit(record)
+
+    def snapshot(self):
+        with self.__lock:
+            return {
+                "counters": dict(self.__counters),
+                "histograms": {name: histogram.summary() for name, histogram in self.__histograms.items()},
+            }
+
+    def flush(self):
+        """Emits the current counter and histogram totals as one "summary" record."""
+        if self.enabled:
+            self.emit({**self.snapshot(), "kind": "summary", "name": "instrumentation"})
+
+    def reset(self):
+        with self.__lock:
+            self.__counters.clear()
+            self.__histograms.clear()
+
+
+instrumentation = Instrumentation()
@@ -0,0 +1,57 @@
+from matplotlib.backends.backend_qtagg import FigureCanvasQTAgg
+from matplotlib.figure import Figure
+from utils.instrumentation import instrumentation
+
+
+class LiveGraphCanvas(FigureCanvasQTAgg):
+    """Embedded GenGraph chart whose bars, value labels and legend are swapped and blitted on a toggle.
+
+    The series artists are animated, so a full draw leaves them out of the
+    cached background. Adding or removing a country swaps them for the new
+    selection's, restores the background and blits the figure. The graph is
+    laid out and drawn again only when the years, the chart type or the y
+    axis change.
+    """
+
+    def __init__(self, parent=None, width=1000, height=600, dpi=100):
+        super().__init__(Figure(figsize=(width / dpi, height / dpi), dpi=dpi))
+        self.setParent(parent)
+        self.__graph = None
+        self.__series = []
+        self.__background = None
+        self.mpl_connect("draw_event", self.__on_draw)
+
+    def blit_graph(self, graph):
+        """Shows graph, a BasePlot, by swapping only its series; returns False if it needs draw_graph."""
+        previous = self.__graph
+        if previous is None or self.__background is None or not graph.can_swap(previous):
+            return False
+
+        with instrumentation.span("graph.blit"):
+            self.__graph = graph
+            self.__series = graph.swap_series(self.figure.axes[0], previous)
+            for artist in self.__series:
+                artist.set_animated(True)
+            self.restore_region(self.__background)
+            self.__draw_series()
+            self.blit(self.figure.bbox)
+        return True
+
+    def draw_graph(self, graph):
+        """Lays graph out from scratch and draws it."""
+        with instrumentation.span("graph.draw"):
+            self.__graph = graph
+            self.__background = None
+            self.figure.clear()
+            self.__series = graph.draw_on(self.figure)
+            for artist in self.__series:
+                artist.set_animated(True)
+            self.draw_idle()
+
+    def __draw_series(self):
+        for artist in self.__series:
+            self.figure.draw_artist(artist)
+
+    def __on_draw(self, event):
+        self.__background = self.copy_from_bbox(self.figure.bbox)
+        self.__draw_series()
@@ -1,21 +1,50 @@
+import time
+_STARTUP_START = time.perf_counter()
+
 import sys
-from PyQt5.QtGui import QFont, QPixmap, QColor
+from PyQt5.QtCore import QCoreApplication, Qt, QTimer
+from PyQt5.QtGui import QFont, QColor
 from PyQt5.QtWidgets import QApplication, QMainWindow, QWidget, QListWidget, QLineEdit, QListWidgetItem, QLabel
 from data.countries import Countries
 from data.voivodeships import Voivodeships
-from data.eurostat import EurostatDataFetcher
 from widgets.base_button import BaseButton
-from widgets.map_widget import MapWidget
 from widgets.buttons_panel import ButtonsPanel
-from widgets.gengraph import GenGraph
-from utils import Map
-from utils import DataProcessor
+from utils.instrumentation import instrumentation
+from utils.task_scheduler import TaskScheduler
+
+
+class StartupTimer:
+    """Startup phase timings, sent as instrumentation events so they only appear when tracing is on."""
+
+    def __init__(self, start):
+        self.__start = start
+        self.__marks = []
+
+    def mark(self, name):
+        self.__marks.append((name, time.perf_counter()))
+
+    def report(self, final_mark="first event loop turn"):
+        self.mark(final_mark)
+        previous = self.__start
+        for name, moment in self.__marks:
+            instrumentation.event("startup.phase", phase=name, ms=(moment - previous) * 1000)
+            previous = moment
+        instrumentation.event("startup.first_window", ms=(previous - self.__start) * 1000)
+
+
+def _load_cube():
+    from utils.dataset_cache import dataset_cache
+    from utils.render_cache import DATA_PATH
+    return dataset_cache.get_cube(DATA_PATH)
+
+
 class CountryFilter:
-    def __init__(self, parent_widget, countries):
+    def __init__(self, parent_widget, countries, on_change=None):
         self.__country_list = QListWidget(parent_widget)
         self.__search_bar = QLineEdit(parent_widget)
         self.specific_countries = set()
         self.__countries = countries
+        self.__on_change = on_change
 
         self.__setup_ui()
 
@@ -47,49 +76,124 @@ class CountryFilter:
         else:
             self.specific_countries.add(country_code)
             item.setBackground(QColor('lightblue'))
+        if self.__on_change is not None:
+            self.__on_change(self.specific_countries)
 
 
 class GraphManager:
-    def __init__(self, parent_widget):
-        self.__image_label = QLabel(parent_widget)
-        self.__image_label.setGeometry(100, 200, 1000, 600)
+    """Shows the selected countries as the GenGraph chart on a LiveGraphCanvas.
+
+    Adding or removing a country builds the graph for the new selection and
+    blits only its bars, labels and legend, as long as the years, the chart
+    type and the y axis stay the same. Otherwise the whole graph is drawn
+    again, debounced across rapid clicks. The dataset is loaded on the
+    scheduler the first time the graph is needed.
+    """
+
+    def __init__(self, parent_widget, scheduler, debounce_ms=40):
+        self.__parent_widget = parent_widget
+        self.__canvas = None
+        self.__cube = None
+        self.__loading = False
+        self.__visible = True
+        self.__scheduler = scheduler
         self.__start_year = None
         self.__end_year = None
-        self.__data_processor = DataProcessor()
+        self.__countries = set()
+        self.__years = None
+        self.__debounce = QTimer()
+        self.__debounce.setSingleShot(True)
+        self.__debounce.setInterval(debounce_ms)
+        self.__debounce.timeout.connect(self.__apply)
 
     def generate_graph(self, specific_countries, years):
-        print(f"Generating graph for countries: {specific_countries}, years: {years}")
-        
+        instrumentation.event("graph.requested", countries=sorted(specific_countries), years=list(years))
+
         if self.__set_year_range(years, specific_countries):
-            try:
-                lines = self.__data_processor.clean_text("resources/car_stat.txt")
-                data = self.__data_processor.transform_to_dict(lines)
-                graph = GenGraph(data, specific_countries, years[0], years[1])
-                graph.save_plot("resources/img.png")
-                self.__image_label.setPixmap(QPixmap("resources/img.png").scaled(1000, 600))
-            except IndexError as e:
-                print(f"Index error during graph generation: {e}")
-            except Exception as e:
-                print(f"An error occurred during graph generation: {e}")
+            self.__countries = set(specific_countries)
+            self.__years = (years[0], years[1])
+            self.__apply()
+        else:
+            instrumentation.event("graph.rejected", countries=len(specific_countries), years=list(years))
+
+    def on_countries_changed(self, specific_countries):
+        self.__countries = set(specific_countries)
+        graph = self.__make_graph() if self.__canvas is not None else None
+        if graph is not None and self.__canvas.blit_graph(graph):
+            self.__debounce.stop()
+            instrumentation.event("graph.blitted", countries=len(self.__countries))
         else:
-            print("Invalid range or no countries selected.")
+            self.__debounce.start()
+
+    def reload_data(self):
+        if self.__cube is not None:
+            self.__load_cube()
+
+    def set_visible(self, visible):
+        self.__visible = visible
+        if self.__canvas is not None:
+            self.__canvas.setVisible(visible)
+
+    def __apply(self):
+        self.__debounce.stop()
+        if self.__cube is None:
+            if not self.__loading:
+                self.__load_cube()
+            return
+        graph = self.__make_graph()
+        if graph is not None:
+            self.__ensure_canvas().draw_graph(graph)
+            instrumentation.event("graph.shown", countries=len(self.__countries))
+
+    def __make_graph(self):
+        from widgets.gengraph import GenGraph
+
+        if self.__cube is None or not self.__countries:
+            return None
+        start_year, end_year = self.__years or (self.__cube.years[0], self.__cube.years[-1])
+        return GenGraph(self.__cube, sorted(self.__countries), start_year, end_year)
+
+    def __load_cube(self):
+        self.__loading = True
+        self.__scheduler.submit(("graph.data",), _load_cube, on_result=self.__on_data_loaded,
+                                on_error=self.__on_graph_error, channel="graph")
+
+    def __on_data_loaded(self, cube):
+        self.__loading = False
+        if not cube.years:
+            self.__on_graph_error(ValueError("No data in car_stat.txt"))
+            return
+        self.__cube = cube
+        self.__apply()
+
+    def __ensure_canvas(self):
+        if self.__canvas is None:
+            from widgets.live_graph import LiveGraphCanvas
+            self.__canvas = LiveGraphCanvas(self.__parent_widget)
+            self.__canvas.setGeometry(100, 200, 1000, 600)
+            self.__canvas.setVisible(self.__visible)
+        return self.__canvas
+
+    def __on_graph_error(self, error):
+        self.__loading = False
+        instrumentation.event("graph.failed", error=type(error).__name__, message=str(error))
 
     def handle_year_button_click(self, year, specific_countries):
         if self.__start_year is None:
             self.__start_year = year
-            print(f"Start Year selected: {year}")
+            instrumentation.event("graph.year_selected", start=year)
         elif self.__end_year is None:
             if year >= self.__start_year:
                 self.__end_year = year
-                print(f"End Year selected: {year}")
+                instrumentation.event("graph.year_selected", start=self.__start_year, end=year)
                 self.generate_graph(specific_countries, (self.__start_year, self.__end_year))
                 self.__reset_year_range()
             else:
-                print("End year must be greater than or equal to start year.")
+                instrumentation.event("graph.year_rejected", start=self.__start_year, end=year)
         else:
             self.__start_year = year
             self.__end_year = None
-            print(f"Start Year re-selected: {year}")
+            instrumentation.event("graph.year_selected", start=year, reselected=True)
 
     def __set_year_range(self, years, specific_countries):
         return (
@@ -117,9 +221,11 @@ class MainWindow(QMainWindow):
         self.setCentralWidget(self.__widget)
 
         self.__countries = Countries()
-        self.__graph_manager = GraphManager(self.__widget)
-        self.__country_filter = CountryFilter(self.__widget, self.__countries)
-        self.__map_widget = MapWidget(560, 200, 900, 600, self.__widget)
+        self.__scheduler = TaskScheduler(parent=self)
+        self.__graph_manager = GraphManager(self.__widget, self.__scheduler)
+        self.__country_filter = CountryFilter(self.__widget, self.__countries,
+                                              on_change=self.__graph_manager.on_countries_changed)
+        self.__map_widget = None
 
         self.__setup_buttons()
         self.__setup_labels()
@@ -127,6 +233,7 @@ class MainWindow(QMainWindow):
     def __setup_buttons(self):
         self.__data_button = BaseButton("Czytaj dane wykresu", 1300, 900, 300, 100, self.fetch_and_display_data, self.__widget)
         self.__convert_map_button = BaseButton("Konwertuj Mapę", 1350, 800, 200, 100, self.convert_map, self.__widget)
+        self.__map_kind_button = BaseButton("Mapa gęstości", 1100, 800, 200, 100, self.toggle_map_kind, self.__widget)
         self.__graph_button = BaseButton("Wykres", 40, 40, 760, 80, self.display_graph_view, self.__widget)
         self.__map_button = BaseButton("Mapa", 800, 40, 760, 80, self.display_map_view, self.__widget)
         self.__year_buttons_panel = ButtonsPanel(
@@ -144,38 +251,87 @@ class MainWindow(QMainWindow):
         self.__map_label.setGeometry(100, 200, 400, 50)
 
     def __setup_logic(self):
-        self.__data_fetcher = EurostatDataFetcher()
+        self.__data_fetcher = None
         self.__voivodeships = Voivodeships()
 
     def fetch_and_display_data(self):
-        response = self.__data_fetcher.get_tsv_data("road_eqr_carpda")
-        if response is not None:
+        if self.__data_fetcher is None:
+            from data.eurostat import EurostatDataFetcher
+            self.__data_fetcher = EurostatDataFetcher()
+
+        self.__scheduler.submit(
+            ("fetch", "road_eqr_carpda"),
+            self.__data_fetcher.get_tsv_data, "road_eqr_carpda",
+            on_result=self.__on_data_fetched,
+        )
+
+    def __on_data_fetched(self, response):
+        if response is not None and self.__data_fetcher.not_modified:
+            print("Data not modified since last download.")
+        elif response is not None:
             print("Data fetched and saved successfully.")
+            self.__graph_manager.reload_data()
         else:
             print("Failed to fetch data.")
 
     def display_map_view(self):
+        if self.__map_widget is None:
+            from widgets.map_widget import MapWidget
+            self.__map_widget = MapWidget(560, 200, 900, 600, self.__widget, scheduler=self.__scheduler)
         self.__set_visibility(map_view=True)
 
     def display_graph_view(self):
         self.__set_visibility(map_view=False)
 
+    def toggle_map_kind(self):
+        if self.__map_widget is None:
+            return
+        kind = "viewport" if self.__map_widget.map_kind == "heatmap" else "heatmap"
+        self.__map_widget.set_map_kind(kind)
+        self.__map_kind_button.setText("Mapa stacji" if kind == "heatmap" else "Mapa gęstości")
+
     def convert_map(self):
+        from utils import Map
+
+        if self.__map_widget is not None:
+            self.__map_widget.reload_map(rebuild=True)
+            return
         converter = Map()
-        converter.txt_to_html()
+        self.__scheduler.submit(
+            ("map",), converter.viewport_to_html,
+            on_result=self.__on_map_converted,
+            on_error=self.__on_map_error,
+        )
+
+    def __on_map_converted(self, _):
+        if self.__map_widget is not None:
+            self.__map_widget.reload_map()
+
+    def __on_map_error(self, error):
+        instrumentation.event("map.failed", error=type(error).__name__, message=str(error))
 
     def __set_visibility(self, map_view=True):
-        self.__map_widget.setVisible(map_view)
+        if self.__map_widget is not None:
+            self.__map_widget.setVisible(map_view)
         self.__map_label.setVisible(map_view)
         self.__convert_map_button.setVisible(map_view)
+        self.__map_kind_button.setVisible(map_view)
         self.__country_filter._CountryFilter__country_list.setVisible(not map_view)
         self.__country_filter._CountryFilter__search_bar.setVisible(not map_view)
         self.__data_button.setVisible(not map_view)
         self.__year_buttons_panel.setVisible(not map_view)
-        self.__graph_manager._GraphManager__image_label.setVisible(not map_view)
+        self.__graph_manager.set_visible(not map_view)
 
 if __name__ == "__main__":
+    startup_timer = StartupTimer(_STARTUP_START)
+    startup_timer.mark("imports")
+    instrumentation.configure_from_env()
+    # Allows QtWebEngineWidgets to be imported after QApplication exists (lazy MapWidget).
+    QCoreApplication.setAttribute(Qt.AA_ShareOpenGLContexts)
     app = QApplication([])
+    app.aboutToQuit.connect(instrumentation.flush)
     main_window = MainWindow()
+    startup_timer.mark("window construction")
     main_window.show()
+    QTimer.singleShot(0, startup_timer.report)
     sys.exit(app.exec())
@@ -1,32 +1,301 @@
 from PyQt5.QtWebEngineWidgets import QWebEngineView
-from PyQt5.QtCore import QUrl
+from PyQt5.QtWebChannel import QWebChannel
+from PyQt5.QtCore import QFile, QIODevice, QObject, QTimer, QUrl, pyqtSignal, pyqtSlot
+import html
+import json
 import os
-import folium
+from utils.Map import VIEWPORT_MAP_PATH
+
+# Pages the widget can show; each has its own file so resources/map.html stays the CLI's output.
+MAP_PAGES = {"viewport": VIEWPORT_MAP_PATH, "heatmap": "resources/map_heatmap.html"}
+
+_MARKER_LAYER_JS = """
+(function () {
+    if (window.pyMarkers) { return; }
+    var leafletMap = null;
+    for (var name in window) {
+        try {
+            if (window[name] instanceof L.Map) { leafletMap = window[name]; break; }
+        } catch (e) {}
+    }
+    if (!leafletMap) { return; }
+    var layer = L.layerGroup().addTo(leafletMap);
+    var markers = {};
+    window.pyMarkers = {
+        apply: function (ops) {
+            ops.forEach(function (op) {
+                var marker = markers[op.id];
+                if (op.op === "add") {
+                    if (marker) { layer.removeLayer(marker); }
+                    marker = L.circleMarker([op.lat, op.lng], op.style);
+                    if (op.popup) { marker.bindPopup(op.popup); }
+                    markers[op.id] = marker.addTo(layer);
+                } else if (op.op === "remove" && marker) {
+                    layer.removeLayer(marker);
+                    delete markers[op.id];
+                } else if (op.op === "style" && marker) {
+                    marker.setStyle(op.style);
+                } else if (op.op === "clear") {
+                    layer.clearLayers();
+                    markers = {};
+                }
+            });
+        }
+    };
+})();
+"""
+
+# Reports the viewport to the "pyjs" bridge (debounced) and draws the stations it answers with.
+# Stale answers are dropped by request number; each answer replaces the previous layer in one go.
+# Only pages saved by Map.viewport_to_html, which carry a station-map meta tag, get the layer.
+_VIEWPORT_JS = """
+(function () {
+    if (window.pyjs || !document.querySelector('meta[name="station-map"][content="viewport"]')) { return; }
+    var leafletMap = null;
+    for (var name in window) {
+        try {
+            if (window[name] instanceof L.Map) { leafletMap = window[name]; break; }
+        } catch (e) {}
+    }
+    if (!leafletMap) { return; }
+    var renderer = L.canvas({padding: 0.2});
+    var layer = L.layerGroup().addTo(leafletMap);
+    var request = 0;
+    var timer = null;
+    new QWebChannel(qt.webChannelTransport, function (channel) {
+        var bridge = window.pyjs = channel.objects.pyjs;
+        bridge.stationsReady.connect(function (payload) {
+            var data = JSON.parse(payload);
+            if (data.request !== request) { return; }
+            var markers = data.stations.map(function (station) {
+                return L.circleMarker([station[0], station[1]], {
+                    renderer: renderer, radius: 4, weight: 1, color: "#1f5fbf", fillOpacity: 0.7,
+                    bubblingMouseEvents: false
+                }).bindPopup(station[2]);
+            });
+            leafletMap.removeLayer(layer);
+            layer = L.layerGroup(markers).addTo(leafletMap);
+        });
+        bridge.nearestReady.connect(function (payload) {
+            var data = JSON.parse(payload);
+            var rows = data.stations.map(function (station) {
+                return station.label + " (" + station.distance_km.toFixed(2) + " km)";
+            });
+            L.popup().setLatLng([data.lat, data.lng]).setContent(rows.join("<br>")).openOn(leafletMap);
+        });
+        function report() {
+            clearTimeout(timer);
+            timer = setTimeout(function () {
+                var bounds = leafletMap.getBounds();
+                request += 1;
+                bridge.viewportChanged(JSON.stringify({
+                    request: request, zoom: leafletMap.getZoom(),
+                    south: bounds.getSouth(), west: bounds.getWest(),
+                    north: bounds.getNorth(), east: bounds.getEast()
+                }));
+            }, %(debounce_ms)d);
+        }
+        leafletMap.on("moveend", report);
+        leafletMap.on("click", function (e) { bridge.handleClick(e.latlng.lat, e.latlng.lng); });
+        report();
+    });
+})();
+"""
+
+_DEFAULT_MARKER_STYLE = {"radius": 6, "color": "#3388ff", "weight": 2, "fillOpacity": 0.6}
+
+
+def _qwebchannel_js():
+    source = QFile(":/qtwebchannel/qwebchannel.js")
+    if not source.open(QIODevice.ReadOnly):
+        print("qwebchannel.js is not available.")
+        return ""
+    try:
+        return bytes(source.readAll()).decode("utf-8")
+    finally:
+        source.close()
+
+
+def _nearest_payload(stations_map, lat, lng):
+    stations = [{**station, "label": html.escape(station["label"] or "")}
+                for station in stations_map.nearest_stations(lat, lng, k=5)]
+    return json.dumps({"lat": lat, "lng": lng, "stations": stations})
+
+
+class StationBridge(QObject):
+    """Python side of the "pyjs" web channel object.
+
+    Viewport reports are debounced again on this side; only the latest one
+    is answered, with at most max_stations stations from the spatial index.
+    The index is built and queried on the scheduler, never on the GUI thread.
+    """
+
+    stationsReady = pyqtSignal(str)
+    nearestReady = pyqtSignal(str)
+
+    def __init__(self, stations_map, scheduler, max_stations=2000, debounce_ms=50, parent=None):
+        super().__init__(parent)
+        self.__map = stations_map
+        self.__scheduler = scheduler
+        self.__max_stations = max_stations
+        self.__viewport = None
+        self.__timer = QTimer(self)
+        self.__timer.setSingleShot(True)
+        self.__timer.setInterval(debounce_ms)
+        self.__timer.timeout.connect(self.__answer_viewport)
+
+    @pyqtSlot(str)
+    def viewportChanged(self, viewport):
+        try:
+            self.__viewport = json.loads(viewport)
+        except ValueError:
+            print("Invalid viewport received from the map page.")
+            return
+        self.__timer.start()
+
+    @pyqtSlot(float, float)
+    def handleClick(self, lat, lng):
+        self.__scheduler.submit(("map.nearest", lat, lng), _nearest_payload, self.__map, lat, lng,
+                                on_result=self.nearestReady.emit, on_error=self.__on_error, channel="map.nearest")
+
+    def __answer_viewport(self):
+        viewport = self.__viewport
+        try:
+            bounds = tuple(float(viewport[side]) for side in ("south", "west", "north", "east"))
+        except (KeyError, TypeError, ValueError):
+            print("Invalid viewport received from the map page.")
+            return
+        self.__scheduler.submit(("map.viewport",) + bounds, self.__map.stations_in_view, *bounds,
+                                limit=self.__max_stations, on_result=lambda payload: self.__send_viewport(
+                                    payload, viewport.get("request")),
+                                on_error=self.__on_error, channel="map.viewport")
+
+    def __send_viewport(self, payload, request):
+        self.stationsReady.emit(json.dumps({**payload, "request": request}))
+
+    @staticmethod
+    def __on_error(error):
+        print(f"Error loading stations for the map: {error}")
+
 
 class MapWidget(QWebEngineView):
-    def __init__(self, x_pos=None, y_pos=None, x_len=None, y_len=None, parent=None):
+    def __init__(self, x_pos=None, y_pos=None, x_len=None, y_len=None, parent=None, scheduler=None, kind="viewport"):
         super().__init__(parent)
-        
+        if kind not in MAP_PAGES:
+            raise ValueError(f"Unknown map kind: {kind}")
+
         if all(v is not None for v in [x_pos, y_pos, x_len, y_len]):
             self.setGeometry(x_pos, y_pos, x_len, y_len)
-        
+
+        self.__kind = kind
+        self.__markers = {}
+        self.__pending = []
+        self.__next_marker_id = 0
+        self.__page_ready = False
+        self.__flush_timer = QTimer(self)
+        self.__flush_timer.setSingleShot(True)
+        self.__flush_timer.setInterval(0)
+        self.__flush_timer.timeout.connect(self.update_map)
+        self.loadFinished.connect(self.__on_load_finished)
+
+        from utils import Map
+        from utils.task_scheduler import TaskScheduler
+        self.__stations_map = Map()
+        self.__scheduler = scheduler or TaskScheduler(parent=self)
+        self.__bridge = StationBridge(self.__stations_map, self.__scheduler, parent=self)
+        self.__channel = QWebChannel(self.page())
+        self.__channel.registerObject("pyjs", self.__bridge)
+        self.page().setWebChannel(self.__channel)
+
+        self.__load_map()
+
+    @property
+    def map_kind(self):
+        return self.__kind
+
+    def set_map_kind(self, kind):
+        """Switches between the viewport station map and the station density heatmap."""
+        if kind not in MAP_PAGES:
+            raise ValueError(f"Unknown map kind: {kind}")
+        self.__kind = kind
         self.__load_map()
 
-    def __load_map(self):
-        map_path = os.path.abspath("resources/map.html")
-        self.setUrl(QUrl.fromLocalFile(map_path))
-        self.page().runJavaScript("pyjs = {}; pyjs.handleClick = function(lat, lng) {};")
+    def __load_map(self, rebuild=False):
+        """Loads the page of the current kind, building it first on the scheduler if rebuild is set or it is missing.
+
+        A viewport page is also rebuilt when the file holds another kind of map.
+        """
+        self.__page_ready = False
+        path = MAP_PAGES[self.__kind]
+        if self.__kind == "viewport":
+            current, build = self.__stations_map.is_viewport_page(path), self.__stations_map.viewport_to_html
+        else:
+            current, build = os.path.exists(path), self.__stations_map.heatmap_to_html
+        if current and not rebuild:
+            self.__show_map(path)
+            return
+        self.__scheduler.submit(("map", self.__kind), build, path, on_result=lambda _: self.__show_map(path),
+                                on_error=self.__on_map_error, channel="map")
+
+    def __show_map(self, path):
+        self.setUrl(QUrl.fromLocalFile(os.path.abspath(path)))
+
+    @staticmethod
+    def __on_map_error(error):
+        print(f"An error occurred during map generation: {error}")
+
+    def reload_map(self, rebuild=False):
+        self.__load_map(rebuild)
 
     def update_map(self):
-        self.__save_and_reload_map()
+        if not self.__page_ready or not self.__pending:
+            return
+        ops, self.__pending = self.__pending, []
+        self.page().runJavaScript(f"window.pyMarkers && window.pyMarkers.apply({json.dumps(ops)});")
 
-    def add_marker(self, lat, lng):
+    def add_marker(self, lat, lng, popup=None, **style):
         try:
-            folium.Marker([lat, lng], popup=f"Marker at ({lat}, {lng})").add_to(self.__map)
-            self.update_map()
-        except ValueError:
+            lat, lng = float(lat), float(lng)
+            if not (-90 <= lat <= 90 and -180 <= lng <= 180):
+                raise ValueError
+        except (TypeError, ValueError):
             print("Invalid coordinates")
+            return None
+
+        marker_id = self.__next_marker_id
+        self.__next_marker_id += 1
+        marker = {"op": "add", "id": marker_id, "lat": lat, "lng": lng,
+                  "popup": popup if popup is not None else f"Marker at ({lat}, {lng})",
+                  "style": {**_DEFAULT_MARKER_STYLE, **style}}
+        self.__markers[marker_id] = marker
+        self.__queue(marker)
+        return marker_id
+
+    def remove_marker(self, marker_id):
+        if self.__markers.pop(marker_id, None) is not None:
+            self.__queue({"op": "remove", "id": marker_id})
+
+    def set_marker_style(self, marker_id, **style):
+        marker = self.__markers.get(marker_id)
+        if marker is not None:
+            marker["style"] = {**marker["style"], **style}
+            self.__queue({"op": "style", "id": marker_id, "style": style})
+
+    def clear_markers(self):
+        self.__markers.clear()
+        self.__queue({"op": "clear"})
+
+    def __queue(self, op):
+        self.__pending.append(op)
+        if self.__page_ready:
+            self.__flush_timer.start()
 
-    def __save_and_reload_map(self):
-        self.__map.save("resources/map.html")
-        self.setUrl(QUrl.fromLocalFile(os.path.abspath("resources/map.html")))
+    def __on_load_finished(self, ok):
+        if not ok:
+            print("Failed to load map page.")
+            return
+        self.page().runJavaScript(_qwebchannel_js() + _VIEWPORT_JS % {"debounce_ms": 150})
+        self.page().runJavaScript(_MARKER_LAYER_JS)
+        self.__page_ready = True
+        self.__pending = list(self.__markers.values())
+        self.update_map()
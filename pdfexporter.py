@@ -1,13 +1,58 @@
-from utils import DataProcessor
+import importlib.util
+import io
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+from matplotlib.backends.backend_pdf import FigureCanvasPdf, PdfPages
+from matplotlib.figure import Figure
+from utils.analytics import CarAnalytics
+from utils.dataset_cache import dataset_cache
+from utils.eurostat_cube import EurostatCube
+from utils.render_cache import DATA_PATH, render_graph
 from widgets.gengraph import GenGraph
 import os
 
+# Strony raportu rysowane przez jeden proces roboczy w jednym zadaniu
+_PAGES_PER_CHUNK = 4
+
+_worker_cube = None
+
+
+def _init_worker(cube_arrays):
+    global _worker_cube
+    _worker_cube = EurostatCube.load_npz(cube_arrays)
+
+
+def _draw_pages(pdf, cube, specs, mot_nrg, width, height):
+    for countries, years in specs:
+        GenGraph(cube, sorted(countries), years[0], years[1], mot_nrg).save_to_pdf(pdf, width, height)
+
+
+def _render_chunk_pdf(specs, mot_nrg, width, height):
+    """Zapisuje kilka stron raportu jako wektorowy PDF w pamięci; rodzic skleja części w kolejności"""
+    buffer = io.BytesIO()
+    with PdfPages(buffer) as pdf:
+        _draw_pages(pdf, _worker_cube, specs, mot_nrg, width, height)
+    return buffer.getvalue()
+
+
+def _render_chunk(specs, mot_nrg, width, height):
+    """Rysuje kilka stron raportu jako gotowe figury, gdy nie ma pypdf; rodzic zapisuje je do jednego PdfPages"""
+    return [GenGraph(_worker_cube, sorted(countries), years[0], years[1], mot_nrg).to_figure(width, height)
+            for countries, years in specs]
+
+
+def merge_available():
+    return importlib.util.find_spec("pypdf") is not None
+
 
 class PDFExporter:
     def __init__(self, parent_widget):
         self.__parent_widget = parent_widget
 
-    def export_graph_to_pdf(self, graph_manager, specific_countries, years, output_path="wykres.pdf"):
+    def export_graph_to_pdf(self, graph_manager, specific_countries, years, output_path="wykres.pdf", mot_nrg="ELC",
+                            data_path=DATA_PATH):
         """Eksportuje aktualny wykres do PDF"""
         if self.__validate_export_params(specific_countries, years):
             try:
@@ -16,23 +61,21 @@ class PDFExporter:
                 if output_dir:  # Jeśli ścieżka zawiera folder
                     os.makedirs(output_dir, exist_ok=True)
 
-                data_processor = DataProcessor()
-                lines = data_processor.clean_text("resources/car_stat.txt")
+                data = dataset_cache.get_cube(data_path)
 
-                if not lines:
-                    print("Brak danych w pliku car_stat.txt")
+                if not data.geo:
+                    print(f"Brak danych w pliku {data_path}")
                     return False
 
-                data = data_processor.transform_to_dict(lines)
-
                 # Sprawdź czy mamy dane dla wybranych krajów
                 available_countries = [c for c in specific_countries if c in data]
                 if not available_countries:
                     print("Brak danych dla wybranych krajów")
                     return False
 
-                graph = GenGraph(data, available_countries, years[0], years[1])
-                success = graph.save_plot_to_pdf(output_path)
+                # Ten sam wykres GenGraph, który GUI rysuje na żywo, z pamięci podręcznej render_graph
+                rendered = render_graph(available_countries, years[0], years[1], mot_nrg=mot_nrg, data_path=data_path)
+                success = self.__save_image_to_pdf(rendered, output_path)
 
                 if success:
                     print(f"Wykres został pomyślnie wyeksportowany do: {output_path}")
@@ -48,6 +91,143 @@ class PDFExporter:
             print("Nieprawidłowe parametry eksportu lub brak wybranych krajów")
             return False
 
+    def export_report(self, specs, output_path="raport.pdf", mot_nrg="ELC", max_workers=None,
+                      width=1500, height=800, summary=False, data_path=DATA_PATH):
+        """Eksportuje wiele wykresów (lista par (kraje, (rok_od, rok_do))) do jednego wielostronicowego PDF
+
+        Strony są wektorowe. Przy więcej niż jednym procesie strony rysują i zapisują do PDF procesy robocze,
+        a rodzic skleja części przez pypdf; bez pypdf procesy robocze tylko budują figury, które rodzic zapisuje
+        do PdfPages. Przy jednym procesie strony rysowane są kolejno prosto do PdfPages.
+        Z summary=True pierwsza strona to tabela wskaźników (CarAnalytics) dla wszystkich krajów raportu.
+        """
+        valid_specs = [(tuple(countries), tuple(years)) for countries, years in specs
+                       if self.__validate_export_params(countries, years)]
+        if len(valid_specs) != len(specs):
+            print(f"Pominięto {len(specs) - len(valid_specs)} nieprawidłowych stron raportu")
+        if not valid_specs:
+            print("Brak stron do wyeksportowania")
+            return None
+
+        workers = max_workers or os.cpu_count() or 1
+        parallel = workers > 1 and len(valid_specs) > _PAGES_PER_CHUNK
+        try:
+            output_dir = os.path.dirname(output_path)
+            if output_dir:
+                os.makedirs(output_dir, exist_ok=True)
+
+            cube = dataset_cache.get_cube(data_path)
+            start = time.perf_counter()
+            if parallel and merge_available():
+                self.__export_report_merged(output_path, cube, valid_specs, mot_nrg, workers, width, height, summary)
+            else:
+                with PdfPages(output_path) as pdf:
+                    if summary:
+                        pdf.savefig(self.__summary_figure(cube, valid_specs, mot_nrg, width))
+                    if parallel:
+                        for figures in self.__render_chunks(_render_chunk, cube, valid_specs, mot_nrg, workers,
+                                                            width, height):
+                            for fig in figures:
+                                pdf.savefig(fig)
+                    else:
+                        workers = 1
+                        _draw_pages(pdf, cube, valid_specs, mot_nrg, width, height)
+            elapsed = time.perf_counter() - start
+
+        except Exception as e:
+            print(f"Błąd podczas eksportu raportu do PDF: {e}")
+            return None
+
+        stats = {
+            "pages": len(valid_specs),
+            "workers": workers,
+            "seconds": elapsed,
+            "pages_per_second": len(valid_specs) / elapsed if elapsed > 0 else float("inf"),
+        }
+        print(f"Raport zapisany do: {output_path} ({stats['pages']} stron, "
+              f"{stats['pages_per_second']:.1f} stron/s, procesy: {workers})")
+        return stats
+
+    def __export_report_merged(self, output_path, cube, specs, mot_nrg, workers, width, height, summary):
+        """Procesy robocze zapisują po _PAGES_PER_CHUNK stron jako PDF, a pypdf skleja części w kolejności"""
+        from pypdf import PdfWriter
+
+        writer = PdfWriter()
+        if summary:
+            buffer = io.BytesIO()
+            self.__summary_figure(cube, specs, mot_nrg, width).savefig(buffer, format="pdf")
+            writer.append(buffer)
+        for part in self.__render_chunks(_render_chunk_pdf, cube, specs, mot_nrg, workers, width, height):
+            writer.append(io.BytesIO(part))
+        with open(output_path, "wb") as f:
+            writer.write(f)
+
+    @staticmethod
+    def __render_chunks(render_chunk, cube, specs, mot_nrg, workers, width, height):
+        """Zwraca w kolejności wyniki render_chunk dla kolejnych części po _PAGES_PER_CHUNK stron z puli procesów
+
+        W toku jest najwyżej 2 * workers części, więc gotowe części nie gromadzą się, gdy rodzic nie nadąża.
+        """
+        chunks = [specs[i:i + _PAGES_PER_CHUNK] for i in range(0, len(specs), _PAGES_PER_CHUNK)]
+        # Dane są parsowane raz i przekazywane do każdego procesu roboczego
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                                 initargs=(cube.to_arrays(),)) as executor:
+            pending = deque()
+            for chunk in chunks:
+                if len(pending) >= 2 * workers:
+                    yield pending.popleft().result()
+                pending.append(executor.submit(render_chunk, chunk, mot_nrg, width, height))
+            while pending:
+                yield pending.popleft().result()
+
+    @staticmethod
+    def country_specs(countries, year_windows):
+        return [((country,), years) for country in countries for years in year_windows]
+
+    def __save_image_to_pdf(self, rendered, output_path):
+        try:
+            self.__image_figure(rendered).savefig(output_path, format="pdf")
+            return True
+        except (OSError, ValueError) as e:
+            print(f"Błąd zapisu pliku PDF: {e}")
+            return False
+
+    @staticmethod
+    def __image_figure(rendered, dpi=100):
+        pixels, width, height = rendered
+        fig = Figure(figsize=(width / dpi, height / dpi), dpi=dpi)
+        FigureCanvasPdf(fig)
+        fig.figimage(np.frombuffer(pixels, dtype=np.uint8).reshape(height, width, 4))
+        return fig
+
+    @staticmethod
+    def __summary_figure(cube, specs, mot_nrg, width, dpi=100):
+        countries = sorted({country for countries, _ in specs for country in countries})
+        start_year = min(years[0] for _, years in specs)
+        end_year = max(years[1] for _, years in specs)
+        analytics = CarAnalytics.from_cube(cube, mot_nrg, countries, start_year, end_year)
+
+        # Wiersze posortowane od największej liczby samochodów w ostatnim roku
+        rows = sorted(analytics.summary(), key=lambda row: -(row["count"] or -1))
+
+        def percent(value):
+            return "-" if value is None else f"{value:.1%}"
+
+        cells = [[row["country"], row["year"] or "-", "-" if row["count"] is None else f"{row['count']:,.0f}",
+                  percent(row["yoy_growth"]), percent(row["cagr"]), percent(row["share"]),
+                  "-" if row["projection"] is None else f"{row['projection']:,.0f}"] for row in rows]
+
+        height = 120 + 22 * (len(cells) + 1)
+        fig = Figure(figsize=(width / dpi, height / dpi), dpi=dpi)
+        FigureCanvasPdf(fig)
+        ax = fig.subplots()
+        ax.axis("off")
+        ax.set_title(f"{mot_nrg}: podsumowanie {start_year}-{end_year}")
+        table = ax.table(cellText=cells, loc="upper center",
+                         colLabels=["Kraj", "Rok", "Liczba", "Zmiana r/r", "CAGR", "Udział", "Prognoza"])
+        table.auto_set_font_size(False)
+        table.set_fontsize(9)
+        return fig
+
     def __validate_export_params(self, specific_countries, years):
         return (
                 len(specific_countries) > 0 and
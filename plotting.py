@@ -1,67 +1,235 @@
+import threading
 import numpy as np
-import matplotlib.pyplot as plt
+from matplotlib import colormaps
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+from matplotlib.collections import PolyCollection
+from matplotlib.colors import LogNorm
+from matplotlib.figure import Figure
+from matplotlib.patches import Patch
+from utils.analytics import CarAnalytics, total_registrations
+from utils.eurostat_cube import EurostatCube
+from utils.instrumentation import instrumentation
+
+_figures = threading.local()
+
+CHART_TYPES = ("auto", "grouped", "stacked", "heatmap")
+# "auto" draws grouped bars up to this many countries and a heatmap above it.
+GROUPED_MAX_COUNTRIES = 12
+# Every bar is labelled up to LABEL_ALL_LIMIT bars, only the tallest bar per year up to LABEL_THIN_LIMIT.
+LABEL_ALL_LIMIT = 60
+LABEL_THIN_LIMIT = 240
+
+
+def acquire_figure(width, height, dpi=100):
+    """Returns this thread's reusable Agg figure, cleared and resized to width x height pixels."""
+    fig = getattr(_figures, "figure", None)
+    if fig is None:
+        fig = Figure()
+        FigureCanvasAgg(fig)
+        _figures.figure = fig
+    fig.clear()
+    fig.set_dpi(dpi)
+    fig.set_size_inches(width / dpi, height / dpi)
+    return fig
+
 
 class BasePlot:
-    def __init__(self, data, specific_countries, start_year, end_year):
+    def __init__(self, data, specific_countries, start_year, end_year, mot_nrg="ELC", chart_type="auto"):
+        if chart_type not in CHART_TYPES:
+            raise ValueError(f"Unknown chart type: {chart_type}")
         self._data = data
+        self._mot_nrg = mot_nrg
         self._specific_countries = specific_countries
         self._start_year = start_year
         self._end_year = end_year
         self._years = list(range(start_year, end_year + 1))
-        self._num_of_cars = self._get_cars_count()
+        self._counts = self._get_cars_count()
+        if chart_type == "auto":
+            chart_type = "grouped" if len(specific_countries) <= GROUPED_MAX_COUNTRIES else "heatmap"
+        self._chart_type = chart_type
+        # Bars, value labels and legend, the artists a live canvas swaps when the selected countries change.
+        self._series_artists = []
 
-    def add_new_plot(self):
-        fig, ax = plt.subplots(figsize=(15, 8))
-        valid_data = self._plot_data(ax)
-        if valid_data:
-            self._customize_plot(ax)
-        return plt
+    def analytics(self):
+        """CarAnalytics over the plotted countries and years, with totals when the data is a cube."""
+        totals = None
+        if isinstance(self._data, EurostatCube):
+            totals = total_registrations(self._data, list(self._specific_countries), self._years)
+        return CarAnalytics(self._counts, self._specific_countries, self._years, totals)
 
     def _get_cars_count(self):
-        num_of_cars = {}
-        for year in self._years:
-            year_data = self._get_year_data(year)
-            num_of_cars[year] = year_data
-        return num_of_cars
-
-    def _get_year_data(self, year):
-        year_data = []
-        for country in self._specific_countries:
-            index = year - self._start_year
-            if 0 <= index < len(self._data.get(country, [])):
-                year_data.append(self._data[country][index])
+        """Masked (country, year) matrix of the plotted counts; missing cells are masked."""
+        with instrumentation.span("compute", countries=len(self._specific_countries), years=len(self._years)):
+            if isinstance(self._data, EurostatCube):
+                counts = self._data.select(self._mot_nrg, list(self._specific_countries), self._years)
             else:
-                print(f"Year {year} index {index} out of range for country {country}.")
-                year_data.append(0)
-        return year_data
+                # Dictionary series start at start_year, one value per year.
+                counts = np.ma.masked_all((len(self._specific_countries), len(self._years)), dtype=np.int64)
+                for row, country in enumerate(self._specific_countries):
+                    series = self._data.get(country, [])[:len(self._years)]
+                    counts[row, :len(series)] = series
+            instrumentation.count("compute.missing_cells", int(np.ma.count_masked(counts)))
+            return counts
 
     def _plot_data(self, ax):
-        x = np.arange(len(self._years))
-        width = 1 / len(self._specific_countries)
-        valid_data = False
-        for i, country in enumerate(self._specific_countries):
-            offset = width * i
-            measurements = self._num_of_cars_for_country(i)
-            if any(measurements):
-                valid_data = True
-            rects = ax.bar(x + offset, measurements, width, label=country)
-            ax.bar_label(rects, padding=3)
-        return valid_data
-
-    def _num_of_cars_for_country(self, index):
-        return [self._num_of_cars[year][index] for year in self._years]
+        """Draws the whole (country, year) matrix as one collection; returns False if it is all empty."""
+        values = self._counts.filled(0).astype(np.float64)
+        if not values.any():
+            return False
+        if self._chart_type == "heatmap":
+            self._plot_heatmap(ax)
+        elif self._chart_type == "stacked":
+            self._plot_stacked(ax, values)
+        else:
+            self._plot_grouped(ax, values)
+        return True
+
+    def _plot_grouped(self, ax, values):
+        n_countries, n_years = values.shape
+        width = 0.8 / n_countries
+        left = np.arange(n_years) - 0.4 + width * np.arange(n_countries)[:, None]
+        self._add_bars(ax, left, left + width, np.zeros_like(values), values)
+
+        if values.size <= LABEL_ALL_LIMIT:
+            rows = np.repeat(np.arange(n_countries), n_years)
+            cols = np.tile(np.arange(n_years), n_countries)
+        elif values.size <= LABEL_THIN_LIMIT:
+            rows, cols = values.argmax(axis=0), np.arange(n_years)
+        else:
+            return
+        self._label_points(ax, left[rows, cols] + width / 2, values[rows, cols])
+
+    def _plot_stacked(self, ax, values):
+        n_years = values.shape[1]
+        tops = np.cumsum(values, axis=0)
+        left = np.broadcast_to(np.arange(n_years) - 0.4, values.shape)
+        self._add_bars(ax, left, left + 0.8, tops - values, tops)
+        self._label_points(ax, np.arange(n_years), tops[-1])
+
+    def _plot_heatmap(self, ax):
+        n_countries, n_years = self._counts.shape
+        cells = np.ma.masked_less_equal(self._counts, 0)
+        # Counts differ by orders of magnitude between countries, so colours follow a log scale.
+        norm = LogNorm(vmin=cells.min(), vmax=cells.max()) if cells.min() < cells.max() else None
+        mesh = ax.pcolormesh(np.arange(n_years + 1) - 0.5, np.arange(n_countries + 1) - 0.5, cells,
+                             cmap="viridis", norm=norm)
+        ax.figure.colorbar(mesh, ax=ax, label='Number of Cars').minorticks_off()
+
+        if cells.size <= LABEL_THIN_LIMIT:
+            rows, cols = np.nonzero(~np.ma.getmaskarray(cells))
+            for row, col, value in zip(rows.tolist(), cols.tolist(), cells.compressed().tolist()):
+                ax.text(col, row, f"{value:.0f}", ha="center", va="center", fontsize=7, color="white")
+
+    def _add_bars(self, ax, left, right, bottom, top):
+        """Adds one PolyCollection with a rectangle per cell of the (country, year) arrays."""
+        verts = np.stack([np.stack([left, bottom], axis=-1), np.stack([left, top], axis=-1),
+                          np.stack([right, top], axis=-1), np.stack([right, bottom], axis=-1)], axis=-2)
+        colors = np.repeat(self._country_colors(), left.shape[1], axis=0)
+        bars = PolyCollection(verts.reshape(-1, 4, 2), facecolors=colors, edgecolors="none")
+        self._series_artists.append(ax.add_collection(bars))
+
+    def _country_colors(self):
+        n_countries = len(self._specific_countries)
+        palette = colormaps["tab10" if n_countries <= 10 else "tab20"]
+        return palette(np.arange(n_countries) % palette.N)
+
+    def _label_points(self, ax, x, y):
+        for x_value, y_value in zip(np.ravel(x).tolist(), np.ravel(y).tolist()):
+            if y_value > 0:
+                self._series_artists.append(ax.annotate(f"{y_value:.0f}", (x_value, y_value), xytext=(0, 3),
+                                                        textcoords="offset points", ha="center", va="bottom",
+                                                        fontsize=8))
 
     def _customize_plot(self, ax):
-        ax.set_ylabel('Number of Cars')
         ax.set_title(f'Number of Cars by Country and Year ({self._start_year}-{self._end_year})')
         ax.set_xticks(np.arange(len(self._years)))
         ax.set_xticklabels([str(year) for year in self._years])
-        ax.legend(loc='upper left', bbox_to_anchor=(1, 1), ncols=1)
-        ax.set_ylim(0, self._get_max_y_value() * 1.1)
+        ax.set_xlim(-0.5, len(self._years) - 0.5)
+        if self._chart_type == "heatmap":
+            ax.set_yticks(np.arange(len(self._specific_countries)))
+            ax.set_yticklabels(self._specific_countries)
+            ax.set_ylim(len(self._specific_countries) - 0.5, -0.5)
+            return
+
+        ax.set_ylabel('Number of Cars')
+        self._add_legend(ax)
+        ax.set_ylim(0, self.y_limit())
+
+    def _add_legend(self, ax):
+        handles = [Patch(facecolor=color, label=country)
+                   for country, color in zip(self._specific_countries, self._country_colors())]
+        self._series_artists.append(ax.legend(handles=handles, loc='upper left', bbox_to_anchor=(1, 1),
+                                              ncols=1 + len(handles) // 25))
+
+    def y_limit(self):
+        """Top of the y axis of a bar chart, a tenth above the tallest bar or stack; 0 without data."""
+        values = self._counts.filled(0)
+        if self._chart_type == "stacked":
+            values = values.sum(axis=0)
+        return float(values.max(initial=0)) * 1.1
+
+    def render_rgba(self, width=1000, height=600, dpi=100):
+        with instrumentation.span("render", width=width, height=height):
+            fig = self._draw(width, height, dpi)
+            try:
+                fig.canvas.draw()
+                pixels = bytes(fig.canvas.buffer_rgba())
+                width, height = fig.canvas.get_width_height()
+            finally:
+                fig.clear()
+        return pixels, width, height
+
+    def save_plot(self, file_path, format=None, width=1500, height=800, dpi=100):
+        with instrumentation.span("render", width=width, height=height, format=format):
+            fig = self._draw(width, height, dpi)
+            try:
+                fig.savefig(file_path, format=format)
+            finally:
+                fig.clear()
 
-    def _get_max_y_value(self):
-        return max(max(measurements) for measurements in self._num_of_cars.values() if measurements)
+    def save_to_pdf(self, pdf, width=1500, height=800, dpi=100):
+        """Adds the graph to an open PdfPages as a vector page."""
+        with instrumentation.span("render", width=width, height=height, format="pdf"):
+            fig = self._draw(width, height, dpi)
+            try:
+                pdf.savefig(fig)
+            finally:
+                fig.clear()
 
-    def save_plot(self, file_path):
-        plt = self.add_new_plot()
-        plt.savefig(file_path)
+    def to_figure(self, width=1500, height=800, dpi=100):
+        """A new, laid-out Figure that the caller owns, e.g. to pickle it to another process."""
+        with instrumentation.span("render", width=width, height=height, format="figure"):
+            return self._layout(Figure(figsize=(width / dpi, height / dpi), dpi=dpi))
+
+    def draw_on(self, fig):
+        """Lays the graph out on an empty fig, e.g. the figure of a live canvas; returns its series artists."""
+        self._layout(fig)
+        return self._series_artists
+
+    def can_swap(self, previous):
+        """True if swap_series can turn previous into this graph: same years, bar chart and y axis."""
+        return (self._chart_type == previous._chart_type != "heatmap" and self._years == previous._years
+                and self.y_limit() == previous.y_limit() > 0)
+
+    def swap_series(self, ax, previous):
+        """Replaces the bars, labels and legend of previous on ax with this graph's; returns the new series artists.
+
+        The axes, ticks and limits stay as previous laid them out, so check can_swap first.
+        """
+        for artist in previous._series_artists:
+            artist.remove()
+        self._series_artists = []
+        self._plot_data(ax)
+        self._add_legend(ax)
+        return self._series_artists
+
+    def _draw(self, width, height, dpi):
+        return self._layout(acquire_figure(width, height, dpi))
+
+    def _layout(self, fig):
+        self._series_artists = []
+        ax = fig.subplots()
+        if self._plot_data(ax):
+            self._customize_plot(ax)
+            fig.tight_layout()
+        return fig
@@ -0,0 +1,94 @@
+import threading
+from collections import OrderedDict
+from utils.dataset_cache import dataset_cache
+from widgets.gengraph import GenGraph
+
+DATA_PATH = "resources/car_stat.txt"
+
+
+class RenderCache:
+    """Size- and memory-bounded LRU of rendered graph images.
+
+    Keys carry the dataset version, so when car_stat.txt changes every entry
+    rendered from the old file is dropped on the next lookup.
+    """
+
+    def __init__(self, max_entries=64, max_bytes=256 * 1024 * 1024):
+        self.__max_entries = max_entries
+        self.__max_bytes = max_bytes
+        self.__entries = OrderedDict()
+        self.__lock = threading.Lock()
+        self.__version = None
+        self.size_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    @staticmethod
+    def make_key(countries, start_year, end_year, version, *variant):
+        return (frozenset(countries), start_year, end_year, version) + tuple(variant)
+
+    def get(self, key):
+        with self.__lock:
+            self.__check_version(key[3])
+            value = self.__entries.get(key)
+            if value is None:
+                self.misses += 1
+                return None
+            self.__entries.move_to_end(key)
+            self.hits += 1
+            return value[0]
+
+    def put(self, key, value, size):
+        with self.__lock:
+            self.__check_version(key[3])
+            if size > self.__max_bytes:
+                return
+            previous = self.__entries.pop(key, None)
+            if previous is not None:
+                self.size_bytes -= previous[1]
+            self.__entries[key] = (value, size)
+            self.size_bytes += size
+            while len(self.__entries) > self.__max_entries or self.size_bytes > self.__max_bytes:
+                _, (_, evicted_size) = self.__entries.popitem(last=False)
+                self.size_bytes -= evicted_size
+                self.evictions += 1
+
+    def clear(self):
+        with self.__lock:
+            self.__entries.clear()
+            self.size_bytes = 0
+
+    def stats(self):
+        return {
+            "entries": len(self.__entries),
+            "bytes": self.size_bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+        }
+
+    def __check_version(self, version):
+        if version == self.__version:
+            return
+        stale = [key for key in self.__entries if key[3] != version]
+        for key in stale:
+            self.size_bytes -= self.__entries.pop(key)[1]
+        self.__version = version
+
+
+render_cache = RenderCache()
+
+
+def render_graph(countries, start_year, end_year, width=1000, height=600, mot_nrg="ELC", data_path=DATA_PATH,
+                 chart_type="auto"):
+    """Returns (rgba_bytes, width, height) for the graph, rendering it only on a cache miss."""
+    key = RenderCache.make_key(countries, start_year, end_year, dataset_cache.version(data_path),
+                               mot_nrg, width, height, chart_type)
+    rendered = render_cache.get(key)
+    if rendered is None:
+        cube = dataset_cache.get_cube(data_path)
+        graph = GenGraph(cube, sorted(countries), start_year, end_year, mot_nrg, chart_type)
+        rendered = graph.render_rgba(width, height)
+        render_cache.put(key, rendered, len(rendered[0]))
+    return rendered
@@ -0,0 +1,88 @@
+import base64
+import io
+import math
+import numpy as np
+
+TILE_SIZE = 256
+MAX_LATITUDE = 85.05112878
+
+
+def mercator_x(longitudes):
+    return (np.asarray(longitudes, dtype=np.float64) + 180) / 360
+
+
+def mercator_y(latitudes):
+    lat = np.radians(np.clip(latitudes, -MAX_LATITUDE, MAX_LATITUDE))
+    return (1 - np.log(np.tan(lat) + 1 / np.cos(lat)) / math.pi) / 2
+
+
+def latitude_from_y(y):
+    return math.degrees(math.atan(math.sinh(math.pi * (1 - 2 * y))))
+
+
+class StationHeatmap:
+    """Station counts binned on a Web Mercator grid, one grid per zoom level.
+
+    Stations are binned once at the finest zoom with cells of cell_px screen
+    pixels; every coarser zoom halves the resolution by summing 2x2 blocks.
+    Leaflet stretches image overlays linearly in Mercator space, so the rows
+    line up with the base map at every zoom.
+    """
+
+    def __init__(self, latitudes, longitudes, min_zoom=5, max_zoom=10, cell_px=4, max_bins=1024):
+        latitudes = np.asarray(latitudes, dtype=np.float64)
+        longitudes = np.asarray(longitudes, dtype=np.float64)
+        valid = (np.isfinite(latitudes) & np.isfinite(longitudes)
+                 & (np.abs(latitudes) <= MAX_LATITUDE) & (np.abs(longitudes) <= 180))
+        x = mercator_x(longitudes[valid])
+        y = mercator_y(latitudes[valid])
+        self.station_count = len(x)
+        self.levels = {}
+        if not self.station_count:
+            self.bounds = None
+            return
+
+        x0, y0 = x.min(), y.min()
+        extent = max(x.max() - x0, y.max() - y0, 1e-9)
+        while max_zoom > min_zoom and extent * TILE_SIZE * 2 ** max_zoom / cell_px > max_bins:
+            max_zoom -= 1
+
+        cell = cell_px / (TILE_SIZE * 2 ** max_zoom)
+        n_cols = int((x.max() - x0) / cell) + 1
+        n_rows = int((y.max() - y0) / cell) + 1
+        # Pad to a multiple of the coarsest block so every level covers the same bounds.
+        block = 2 ** (max_zoom - min_zoom)
+        n_cols = -(-n_cols // block) * block
+        n_rows = -(-n_rows // block) * block
+
+        columns = ((x - x0) / cell).astype(np.int64)
+        rows = ((y - y0) / cell).astype(np.int64)
+        counts = np.bincount(rows * n_cols + columns, minlength=n_rows * n_cols).reshape(n_rows, n_cols)
+
+        self.levels[max_zoom] = counts
+        for zoom in range(max_zoom - 1, min_zoom - 1, -1):
+            counts = counts.reshape(counts.shape[0] // 2, 2, counts.shape[1] // 2, 2).sum(axis=(1, 3))
+            self.levels[zoom] = counts
+
+        x1, y1 = x0 + n_cols * cell, y0 + n_rows * cell
+        west, east = float(x0) * 360 - 180, float(x1) * 360 - 180
+        self.bounds = [[latitude_from_y(float(y1)), west], [latitude_from_y(float(y0)), east]]
+
+    def png(self, zoom, colormap="inferno_r"):
+        """The grid for one zoom as a PNG; empty cells are transparent, the rest log-scaled."""
+        from matplotlib import colormaps
+        from matplotlib.image import imsave
+
+        counts = self.levels[zoom]
+        scaled = np.log1p(counts) / np.log1p(max(counts.max(), 1))
+        rgba = colormaps[colormap](0.15 + 0.85 * scaled)
+        rgba[..., 3] = np.where(counts > 0, 0.45 + 0.55 * scaled, 0)
+
+        buffer = io.BytesIO()
+        imsave(buffer, rgba, format="png")
+        return buffer.getvalue()
+
+    def data_uris(self, colormap="inferno_r"):
+        """[zoom, "data:image/png;base64,..."] pairs, coarsest first."""
+        return [[zoom, "data:image/png;base64," + base64.b64encode(self.png(zoom, colormap)).decode("ascii")]
+                for zoom in sorted(self.levels)]
@@ -0,0 +1,130 @@
+import math
+import numpy as np
+
+EARTH_RADIUS_KM = 6371.0088
+
+
+def haversine_km(lat, lon, latitudes, longitudes):
+    lat1 = math.radians(lat)
+    lat2 = np.radians(latitudes)
+    dlat = lat2 - lat1
+    dlon = np.radians(longitudes) - math.radians(lon)
+    a = np.sin(dlat / 2) ** 2 + math.cos(lat1) * np.cos(lat2) * np.sin(dlon / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(np.minimum(a, 1.0)))
+
+
+class StationIndex:
+    """Uniform lat/lon grid over station coordinates.
+
+    Points are sorted by grid cell, so every cell is a contiguous slice that
+    is found with a single dictionary lookup. Queries only compute haversine
+    distances for the cells overlapping the search radius.
+    """
+
+    def __init__(self, latitudes, longitudes, labels=None, cell_size_deg=0.1):
+        self.latitudes = np.asarray(latitudes, dtype=np.float64)
+        self.longitudes = np.asarray(longitudes, dtype=np.float64)
+        self.labels = labels
+        self.__cell_size = cell_size_deg
+        self.__n_cols = int(math.ceil(360 / cell_size_deg))
+
+        cell_ids = self.__row(self.latitudes) * self.__n_cols + self.__col(self.longitudes)
+        self.__order = np.argsort(cell_ids, kind="stable")
+        self.__sorted_lat = self.latitudes[self.__order]
+        self.__sorted_lon = self.longitudes[self.__order]
+
+        ids, starts, counts = np.unique(cell_ids[self.__order], return_index=True, return_counts=True)
+        self.__cells = {cell: (start, start + count)
+                        for cell, start, count in zip(ids.tolist(), starts.tolist(), counts.tolist())}
+
+    def __len__(self):
+        return len(self.latitudes)
+
+    def within_radius(self, lat, lon, radius_km):
+        """Returns (indices, distances_km) of stations within radius_km, nearest first."""
+        positions = self.__candidates(lat, lon, radius_km)
+        distances = haversine_km(lat, lon, self.__sorted_lat[positions], self.__sorted_lon[positions])
+        inside = distances <= radius_km
+        positions, distances = positions[inside], distances[inside]
+        nearest_first = np.argsort(distances, kind="stable")
+        return self.__order[positions[nearest_first]], distances[nearest_first]
+
+    def nearest(self, lat, lon, k=1):
+        """Returns (indices, distances_km) of the k nearest stations, nearest first."""
+        k = min(k, len(self))
+        if k <= 0:
+            return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float64)
+
+        radius_km = self.__cell_size * 111.2
+        while radius_km < math.pi * EARTH_RADIUS_KM:
+            indices, distances = self.within_radius(lat, lon, radius_km)
+            if len(indices) >= k:
+                return indices[:k], distances[:k]
+            radius_km *= 2
+
+        distances = haversine_km(lat, lon, self.latitudes, self.longitudes)
+        nearest_first = np.argsort(distances, kind="stable")[:k]
+        return nearest_first, distances[nearest_first]
+
+    def within_bbox(self, south, west, north, east):
+        """Returns the indices of stations inside the box, in grid order.
+
+        west may be greater than east when the box crosses the antimeridian.
+        """
+        width = (east - west) % 360 if east - west < 360 else 360
+        rows = range(int(self.__row(max(south, -90))), int(self.__row(min(north, 90))) + 1)
+        first_col = int(math.floor((west + 180) / self.__cell_size))
+        last_col = first_col + int(math.ceil(width / self.__cell_size))
+        if len(rows) * (last_col - first_col + 1) > len(self.__cells):
+            positions = np.arange(len(self))
+        else:
+            positions = self.__cell_positions(rows, first_col, last_col)
+
+        lat = self.__sorted_lat[positions]
+        inside = (lat >= south) & (lat <= north) & ((self.__sorted_lon[positions] - west) % 360 <= width)
+        return self.__order[positions[inside]]
+
+    def records(self, indices, distances):
+        return [
+            {
+                "label": self.labels[i] if self.labels is not None else None,
+                "lat": float(self.latitudes[i]),
+                "lon": float(self.longitudes[i]),
+                "distance_km": float(distance),
+            }
+            for i, distance in zip(indices.tolist(), distances.tolist())
+        ]
+
+    def __candidates(self, lat, lon, radius_km):
+        dlat = math.degrees(radius_km / EARTH_RADIUS_KM)
+        lat_min, lat_max = lat - dlat, lat + dlat
+        widest = max(abs(lat_min), abs(lat_max))
+        if widest >= 90:
+            return np.arange(len(self))
+        dlon = math.degrees(radius_km / (EARTH_RADIUS_KM * math.cos(math.radians(widest))))
+        if dlon >= 180:
+            return np.arange(len(self))
+
+        rows = range(int(self.__row(lat_min)), int(self.__row(lat_max)) + 1)
+        first_col = int(math.floor((lon - dlon + 180) / self.__cell_size))
+        last_col = int(math.floor((lon + dlon + 180) / self.__cell_size))
+        return self.__cell_positions(rows, first_col, last_col)
+
+    def __cell_positions(self, rows, first_col, last_col):
+        cols = [col % self.__n_cols for col in range(first_col, min(last_col, first_col + self.__n_cols - 1) + 1)]
+
+        slices = []
+        for row in rows:
+            for col in cols:
+                cell = self.__cells.get(row * self.__n_cols + col)
+                if cell is not None:
+                    slices.append(np.arange(*cell))
+        if not slices:
+            return np.empty(0, dtype=np.int64)
+        return np.concatenate(slices)
+
+    def __row(self, latitudes):
+        return np.floor((np.asarray(latitudes) + 90) / self.__cell_size).astype(np.int64)
+
+    def __col(self, longitudes):
+        return np.floor((np.asarray(longitudes) + 180) / self.__cell_size).astype(np.int64) % self.__n_cols
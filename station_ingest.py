@@ -0,0 +1,149 @@
+import contextlib
+import math
+import re
+import unicodedata
+from collections import Counter
+from itertools import islice
+import numpy as np
+from utils.instrumentation import instrumentation
+
+# south, west, north, east; a little wider than Poland so border stations are kept
+POLAND_BOUNDS = (48.9, 14.0, 55.0, 24.3)
+REJECT_REASONS = ("unparsable", "out_of_range", "outside_bounds", "duplicate")
+
+_COMMAS = re.compile(r" ?, ?")
+_DASH_TO_FIX = re.compile(r" -|- |[‐-―]")
+_POSTAL_CODE = re.compile(r"\b(\d{2}) ?[-‐-―] ?(\d{3})\b")
+
+
+def normalize_address(address):
+    """NFC, single spaces, ", " between parts and postal codes written as 00-000."""
+    if not unicodedata.is_normalized("NFC", address):
+        address = unicodedata.normalize("NFC", address)
+    address = " ".join(address.split())
+    # Most rows are already clean, so the regular expressions only run when they can change something.
+    if " ," in address or address.count(",") != address.count(", "):
+        address = _COMMAS.sub(", ", address)
+    if _DASH_TO_FIX.search(address):
+        address = _POSTAL_CODE.sub(r"\1-\2", address)
+    return address.strip(" ,")
+
+
+class StationIngest:
+    """Streams "lat lon address" lines through parsing, validation and de-duplication.
+
+    Lines are read chunk_size at a time and only accepted rows are yielded, so
+    memory does not grow with the file. Rows are duplicates when their
+    coordinates rounded to precision decimals and their address (ignoring case)
+    match an earlier row; only a 64-bit hash of that key is remembered, in one
+    sorted NumPy array.
+    """
+
+    def __init__(self, bounds=POLAND_BOUNDS, precision=5, chunk_size=65536, rejected_path=None, max_samples=10):
+        if bounds is not None and (bounds[0] > bounds[2] or bounds[1] > bounds[3]):
+            raise ValueError(f"Bounds must be (south, west, north, east) with south <= north and west <= east, "
+                             f"got {tuple(bounds)}")
+        self.__bounds = bounds
+        self.__precision = precision
+        self.__chunk_size = chunk_size
+        self.__rejected_path = rejected_path
+        self.__max_samples = max_samples
+        self.__seen = np.empty(0, dtype=np.int64)
+        self.accepted = 0
+        self.swapped = 0
+        self.rejected = Counter()
+        self.samples = []
+
+    def rows(self, source_path):
+        """Yields (latitude, longitude, address) for every accepted row of source_path."""
+        with open(source_path, "r", encoding="utf-8") as f, self.__open_report() as report:
+            lines = enumerate(f, 1)
+            while True:
+                chunk = list(islice(lines, self.__chunk_size))
+                if not chunk:
+                    break
+                yield from self.__process(chunk, report)
+
+        instrumentation.event("stations.ingested", path=source_path, accepted=self.accepted,
+                              swapped=self.swapped, **{reason: self.rejected[reason] for reason in REJECT_REASONS})
+
+    def print_report(self, source_path):
+        print(f"{source_path}: {self.accepted} stations accepted, {sum(self.rejected.values())} rejected"
+              + (f", {self.swapped} with latitude and longitude swapped back" if self.swapped else ""))
+        for reason in REJECT_REASONS:
+            if self.rejected[reason]:
+                print(f"  {reason}: {self.rejected[reason]}")
+        for line_no, reason, text in self.samples:
+            print(f"  line {line_no} ({reason}): {text}")
+        if self.__rejected_path and self.rejected:
+            print(f"  all rejected rows: {self.__rejected_path}")
+
+    def __process(self, chunk, report):
+        valid = []
+        for line_no, line in chunk:
+            row = self.__validate(line_no, line, report)
+            if row is not None:
+                valid.append((line_no, line) + row)
+
+        precision = self.__precision
+        hashes = np.fromiter((hash((round(latitude, precision), round(longitude, precision), address.casefold()))
+                              for _, _, latitude, longitude, address in valid), dtype=np.int64, count=len(valid))
+        for (line_no, line, latitude, longitude, address), fresh in zip(valid, self.__first_seen(hashes).tolist()):
+            if fresh:
+                self.accepted += 1
+                yield latitude, longitude, address
+            else:
+                self.__reject(line_no, "duplicate", line, report)
+
+    def __validate(self, line_no, line, report):
+        parts = line.split(maxsplit=2)
+        try:
+            latitude, longitude = float(parts[0]), float(parts[1])
+        except (IndexError, ValueError):
+            latitude = longitude = math.nan
+        if not (math.isfinite(latitude) and math.isfinite(longitude)):
+            if line.strip():
+                self.__reject(line_no, "unparsable", line, report)
+            return None
+
+        bounds = self.__bounds
+        if bounds is not None and not (bounds[0] <= latitude <= bounds[2] and bounds[1] <= longitude <= bounds[3]):
+            if bounds[0] <= longitude <= bounds[2] and bounds[1] <= latitude <= bounds[3]:
+                latitude, longitude = longitude, latitude
+                self.swapped += 1
+            elif abs(latitude) > 90 or abs(longitude) > 180:
+                return self.__reject(line_no, "out_of_range", line, report)
+            else:
+                return self.__reject(line_no, "outside_bounds", line, report)
+        elif abs(latitude) > 90 or abs(longitude) > 180:
+            return self.__reject(line_no, "out_of_range", line, report)
+
+        return latitude, longitude, normalize_address(parts[2]) if len(parts) > 2 else ""
+
+    def __first_seen(self, hashes):
+        """True for the first row of each key not seen in an earlier chunk; remembers the new keys."""
+        unique, first = np.unique(hashes, return_index=True)
+        positions = np.searchsorted(self.__seen, unique)
+        known = np.zeros(len(unique), dtype=bool)
+        if len(self.__seen):
+            known = self.__seen[np.minimum(positions, len(self.__seen) - 1)] == unique
+        fresh = np.zeros(len(hashes), dtype=bool)
+        fresh[first[~known]] = True
+        self.__seen = np.insert(self.__seen, positions[~known], unique[~known])
+        return fresh
+
+    def __reject(self, line_no, reason, line, report):
+        text = line.rstrip("\r\n")
+        self.rejected[reason] += 1
+        if len(self.samples) < self.__max_samples:
+            self.samples.append((line_no, reason, text))
+        if report is not None:
+            report.write(f"{line_no}\t{reason}\t{text}\n")
+        return None
+
+    def __open_report(self):
+        if self.__rejected_path is None:
+            return contextlib.nullcontext()
+        report = open(self.__rejected_path, "w", encoding="utf-8")
+        report.write("line\treason\ttext\n")
+        return report
@@ -0,0 +1,129 @@
+import math
+import mmap
+import os
+import struct
+import sys
+from array import array
+import numpy as np
+from utils.atomic_file import atomic_path
+from utils.station_ingest import POLAND_BOUNDS, StationIngest
+
+_MAGIC = b"STNSTOR3"
+# magic, count, blob size, source mtime_ns, source size, accepted bounds (NaN for none);
+# padded so the arrays start 8-byte aligned
+_HEADER = struct.Struct("<8sQQqQ4d")
+_HEADER_SIZE = 80
+_NO_BOUNDS = (math.nan,) * 4
+
+
+class _Labels:
+    def __init__(self, offsets, blob):
+        self.__offsets = offsets
+        self.__blob = blob
+
+    def __len__(self):
+        return len(self.__offsets) - 1
+
+    def __getitem__(self, i):
+        return bytes(self.__blob[int(self.__offsets[i]):int(self.__offsets[i + 1])]).decode("utf-8")
+
+    def __iter__(self):
+        return (self[i] for i in range(len(self)))
+
+
+class StationStore:
+    """Charging stations as float64 lat/lon columns plus an offset-indexed UTF-8 label blob.
+
+    The binary file is built once from stacje.txt and opened with mmap, so the
+    columns are NumPy views over the mapped pages rather than Python objects.
+    Rows are validated and de-duplicated by StationIngest on the way in; the
+    header records the source file stamp and the bounds the rows were kept to.
+    """
+
+    def __init__(self, latitudes, longitudes, offsets, blob, mapping=None):
+        self.latitudes = latitudes
+        self.longitudes = longitudes
+        self.offsets = offsets
+        self.labels = _Labels(offsets, blob)
+        self.__mapping = mapping
+
+    def __len__(self):
+        return len(self.latitudes)
+
+    @classmethod
+    def load(cls, source_path, store_path=None, bounds=POLAND_BOUNDS):
+        """Opens the store for source_path, rebuilding it first if the text file or the bounds changed."""
+        store_path = store_path or source_path + ".store"
+        stat = os.stat(source_path)
+        if cls.__header_matches(store_path, stat, bounds):
+            return cls.open(store_path)
+        cls.build(source_path, store_path, bounds=bounds)
+        return cls.open(store_path)
+
+    @classmethod
+    def open(cls, store_path):
+        with open(store_path, "rb") as f:
+            mapping = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, count, blob_size = _HEADER.unpack_from(mapping, 0)[:3]
+        if magic != _MAGIC:
+            mapping.close()
+            raise ValueError(f"Not a station store: {store_path}")
+
+        position = _HEADER_SIZE
+        latitudes = np.frombuffer(mapping, dtype="<f8", count=count, offset=position)
+        position += 8 * count
+        longitudes = np.frombuffer(mapping, dtype="<f8", count=count, offset=position)
+        position += 8 * count
+        offsets = np.frombuffer(mapping, dtype="<u8", count=count + 1, offset=position)
+        position += 8 * (count + 1)
+        blob = memoryview(mapping)[position:position + blob_size]
+        return cls(latitudes, longitudes, offsets, blob, mapping)
+
+    @classmethod
+    def build(cls, source_path, store_path, rejected_path=None, bounds=POLAND_BOUNDS):
+        latitudes = array("d")
+        longitudes = array("d")
+        offsets = array("Q", [0])
+        blob = bytearray()
+
+        stat = os.stat(source_path)
+        ingest = StationIngest(bounds=bounds, rejected_path=rejected_path)
+        for latitude, longitude, address in ingest.rows(source_path):
+            latitudes.append(latitude)
+            longitudes.append(longitude)
+            blob += address.encode("utf-8")
+            offsets.append(len(blob))
+
+        if sys.byteorder == "big":
+            for column in (latitudes, longitudes, offsets):
+                column.byteswap()
+
+        header = _HEADER.pack(_MAGIC, len(latitudes), len(blob), stat.st_mtime_ns, stat.st_size,
+                              *(bounds or _NO_BOUNDS))
+        with atomic_path(store_path) as tmp_path, open(tmp_path, "wb") as f:
+            f.write(header.ljust(_HEADER_SIZE, b"\0"))
+            f.write(latitudes.tobytes())
+            f.write(longitudes.tobytes())
+            f.write(offsets.tobytes())
+            f.write(blob)
+        return ingest
+
+    @staticmethod
+    def __header_matches(store_path, stat, bounds):
+        try:
+            with open(store_path, "rb") as f:
+                magic, _, _, mtime_ns, size, *stored_bounds = _HEADER.unpack(f.read(_HEADER.size))
+        except (OSError, struct.error):
+            return False
+        # Compared as packed doubles so that NaN, the "no bounds" marker, matches itself.
+        same_bounds = struct.pack("<4d", *stored_bounds) == struct.pack("<4d", *(bounds or _NO_BOUNDS))
+        return magic == _MAGIC and mtime_ns == stat.st_mtime_ns and size == stat.st_size and same_bounds
+
+    def close(self):
+        mapping, self.__mapping = self.__mapping, None
+        self.latitudes = self.longitudes = self.offsets = self.labels = None
+        if mapping is not None:
+            try:
+                mapping.close()
+            except BufferError:
+                pass  # views handed out earlier still reference the pages; GC closes it later
@@ -0,0 +1,136 @@
+import threading
+from concurrent.futures import CancelledError
+from PyQt5.QtCore import QObject, QRunnable, QThreadPool, pyqtSignal
+from utils.instrumentation import instrumentation
+
+
+class _TaskSignals(QObject):
+    finished = pyqtSignal(object, object)
+    failed = pyqtSignal(object, object)
+
+
+class Task:
+    def __init__(self, key, channel, func, args, kwargs):
+        self.key = key
+        self.channel = channel
+        self.func = func
+        self.args = args
+        self.kwargs = kwargs
+        self.signals = _TaskSignals()
+        self.runnable = None
+        self.__callbacks = []
+        self.__cancelled = threading.Event()
+
+    @property
+    def cancelled(self):
+        return self.__cancelled.is_set()
+
+    def cancel(self):
+        self.__cancelled.set()
+
+    def check_cancelled(self):
+        if self.cancelled:
+            raise CancelledError(f"Task {self.key!r} was cancelled")
+
+    def add_callbacks(self, on_result=None, on_error=None):
+        self.__callbacks.append((on_result, on_error))
+
+    def callbacks(self):
+        return list(self.__callbacks)
+
+
+class _TaskRunnable(QRunnable):
+    def __init__(self, task):
+        super().__init__()
+        self.__task = task
+        self.setAutoDelete(False)
+
+    def run(self):
+        task = self.__task
+        if task.cancelled:
+            return
+        try:
+            result = task.func(*task.args, **task.kwargs)
+        except Exception as e:
+            task.signals.failed.emit(task, e)
+        else:
+            task.signals.finished.emit(task, result)
+
+
+class TaskScheduler(QObject):
+    """Runs jobs on a QThreadPool and delivers results back on the GUI thread.
+
+    Submitting a key that is already in flight attaches to the running task
+    instead of starting a new one. Submitting to a channel cancels the task
+    previously submitted to that channel, so only the newest result is shown.
+    """
+
+    def __init__(self, max_threads=None, parent=None):
+        super().__init__(parent)
+        self.__pool = QThreadPool(self)
+        if max_threads is not None:
+            self.__pool.setMaxThreadCount(max_threads)
+        self.__in_flight = {}
+        self.__latest = {}
+
+    def submit(self, key, func, *args, on_result=None, on_error=None, channel=None, **kwargs):
+        task = self.__in_flight.get(key)
+        if task is not None and not task.cancelled:
+            task.add_callbacks(on_result, on_error)
+            return task
+
+        if channel is not None:
+            previous = self.__latest.get(channel)
+            if previous is not None:
+                self.cancel(previous)
+
+        task = Task(key, channel, func, args, kwargs)
+        task.add_callbacks(on_result, on_error)
+        task.signals.finished.connect(self.__on_finished)
+        task.signals.failed.connect(self.__on_failed)
+        task.runnable = _TaskRunnable(task)
+
+        self.__in_flight[key] = task
+        if channel is not None:
+            self.__latest[channel] = task
+        self.__pool.start(task.runnable)
+        return task
+
+    def cancel(self, task):
+        task.cancel()
+        self.__pool.tryTake(task.runnable)
+        self.__forget(task)
+
+    def cancel_all(self):
+        for task in list(self.__in_flight.values()):
+            self.cancel(task)
+
+    def is_busy(self, key):
+        return key in self.__in_flight
+
+    def wait_for_done(self, msecs=-1):
+        return self.__pool.waitForDone(msecs)
+
+    def __on_finished(self, task, result):
+        self.__forget(task)
+        if task.cancelled:
+            return
+        for on_result, _ in task.callbacks():
+            if on_result is not None:
+                on_result(result)
+
+    def __on_failed(self, task, error):
+        self.__forget(task)
+        if task.cancelled or isinstance(error, CancelledError):
+            return
+        for _, on_error in task.callbacks():
+            if on_error is not None:
+                on_error(error)
+            else:
+                instrumentation.event("task.failed", key=task.key, error=type(error).__name__, message=str(error))
+
+    def __forget(self, task):
+        if self.__in_flight.get(task.key) is task:
+            del self.__in_flight[task.key]
+        if task.channel is not None and self.__latest.get(task.channel) is task:
+            del self.__latest[task.channel]
@@ -0,0 +1,78 @@
+import numpy as np
+import pytest
+from utils.analytics import CarAnalytics
+
+YEARS = [2020, 2021, 2022, 2023]
+M = np.nan
+
+
+@pytest.fixture
+def analytics():
+    counts = [[100, 200, M, 400],
+              [0, 50, 100, 100],
+              [M, M, M, M],
+              [M, 10, M, M]]
+    totals = [[1000, 1000, 1000, 1000]] * 4
+    return CarAnalytics(counts, ["PL", "DE", "XX", "CZ"], YEARS, totals)
+
+
+def test_cagr_spans_first_to_last_reported_year(analytics):
+    cagr = analytics.cagr()
+    assert cagr[0] == pytest.approx(4 ** (1 / 3) - 1)
+    assert cagr.mask.tolist() == [False, True, True, True]
+
+
+def test_yoy_growth_masks_gaps_zeros_and_the_first_year(analytics):
+    growth = analytics.yoy_growth()
+    assert growth.tolist() == [[None, 1.0, None, None],
+                               [None, None, 1.0, 0.0],
+                               [None, None, None, None],
+                               [None, None, None, None]]
+
+
+@pytest.mark.parametrize("log", [False, True])
+def test_trend_matches_polyfit_on_the_reported_years(analytics, log):
+    future, projection = analytics.trend(years_ahead=2, log=log)
+    assert future == [2024, 2025]
+
+    x = np.array(YEARS, dtype=np.float64)
+    for row in (0, 1):
+        counts = analytics.counts[row]
+        keep = ~np.ma.getmaskarray(counts) & (counts.filled(0) > 0 if log else True)
+        y = counts.filled(0)[keep]
+        slope, intercept = np.polyfit(x[keep], np.log(y) if log else y, 1)
+        expected = intercept + slope * np.array(future, dtype=np.float64)
+        expected = np.exp(expected) if log else np.maximum(expected, 0)
+        np.testing.assert_allclose(projection[row].filled(np.nan), expected)
+    assert np.ma.getmaskarray(projection[2:]).all()
+
+
+def test_trend_never_projects_below_zero():
+    _, projection = CarAnalytics([[300, 200, 100]], ["PL"], [2021, 2022, 2023]).trend(3)
+    assert projection.tolist() == [[0.0, 0.0, 0.0]]
+
+
+def test_ranks_order_countries_per_year_and_mask_missing(analytics):
+    ranks = analytics.ranks()
+    assert ranks.tolist() == [[1, 1, None, 1],
+                              [2, 2, 1, 2],
+                              [None, None, None, None],
+                              [None, 3, None, None]]
+
+
+def test_ranking_and_share_leave_out_missing(analytics):
+    assert analytics.ranking(year=2021) == [("PL", 200.0), ("DE", 50.0), ("CZ", 10.0)]
+    assert analytics.share()[:, 3].tolist() == [0.4, 0.1, None, None]
+
+
+def test_summary_uses_each_country_last_reported_year(analytics):
+    rows = {row["country"]: row for row in analytics.summary()}
+    assert rows["PL"]["year"] == 2023 and rows["PL"]["count"] == 400.0
+    assert rows["CZ"]["year"] == 2021 and rows["CZ"]["projection"] is None
+    assert rows["XX"] == {"country": "XX", "year": None, "count": None, "yoy_growth": None,
+                          "cagr": None, "share": None, "projection": None}
+
+
+def test_no_years_is_rejected():
+    with pytest.raises(ValueError):
+        CarAnalytics(np.empty((1, 0)), ["PL"], [])
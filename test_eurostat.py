@@ -0,0 +1,139 @@
+import os
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import pytest
+from data.eurostat import EurostatBatchFetcher, EurostatDataFetcher, create_session
+
+TSV = b"freq,unit,mot_nrg,geo\\TIME_PERIOD\t2022 \t2023 \r\nA,NR,ELC,PL\t100 \t200 \r\n"
+ETAG = '"v1"'
+
+
+class StandInHandler(BaseHTTPRequestHandler):
+    """Serves TSV for any dataset path; the server's attributes decide how it answers."""
+
+    def do_GET(self):
+        server = self.server
+        with server.lock:
+            server.requests.append(self.headers)
+            failures_left = server.failures_left
+            server.failures_left = max(0, failures_left - 1)
+            server.active += 1
+            server.max_active = max(server.max_active, server.active)
+        try:
+            time.sleep(server.delay)
+            self.__answer(failures_left)
+        finally:
+            with server.lock:
+                server.active -= 1
+
+    def __answer(self, failures_left):
+        if failures_left:
+            self.send_response(503)
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+        elif self.headers.get("If-None-Match") == ETAG:
+            self.send_response(304)
+            self.end_headers()
+        else:
+            self.send_response(200)
+            self.send_header("ETag", ETAG)
+            self.send_header("Content-Length", str(len(TSV)))
+            self.end_headers()
+            self.wfile.write(TSV)
+
+    def log_message(self, format, *args):
+        pass
+
+
+@pytest.fixture
+def server():
+    httpd = ThreadingHTTPServer(("127.0.0.1", 0), StandInHandler)
+    httpd.lock = threading.Lock()
+    httpd.requests = []
+    httpd.failures_left = 0
+    httpd.delay = 0
+    httpd.active = 0
+    httpd.max_active = 0
+    thread = threading.Thread(target=httpd.serve_forever, daemon=True)
+    thread.start()
+    httpd.base_url = f"http://127.0.0.1:{httpd.server_address[1]}/data"
+    yield httpd
+    httpd.shutdown()
+    httpd.server_close()
+
+
+def test_second_fetch_is_not_modified(server, tmp_path):
+    output = tmp_path / "car_stat.txt"
+    fetcher = EurostatDataFetcher(str(output), server.base_url)
+
+    assert fetcher.get_tsv_data("road_eqr_carpda") is not None
+    assert not fetcher.not_modified
+    assert output.read_bytes() == TSV
+    assert fetcher.bytes_written == len(TSV)
+
+    assert fetcher.get_tsv_data("road_eqr_carpda") is not None
+    assert fetcher.not_modified
+    assert server.requests[-1]["If-None-Match"] == ETAG
+    assert output.read_bytes() == TSV
+
+
+def test_download_keeps_umask_permissions(server, tmp_path):
+    output = tmp_path / "car_stat.txt"
+    EurostatDataFetcher(str(output), server.base_url).get_tsv_data("road_eqr_carpda")
+
+    umask = os.umask(0)
+    os.umask(umask)
+    assert output.stat().st_mode & 0o777 == 0o666 & ~umask
+    assert sorted(os.listdir(tmp_path)) == ["car_stat.txt", "car_stat.txt.meta.json"]
+
+
+def test_503_is_retried(server, tmp_path):
+    server.failures_left = 2
+    output = tmp_path / "car_stat.txt"
+    fetcher = EurostatDataFetcher(str(output), server.base_url,
+                                  session=create_session(pool_size=1, retries=3, backoff_factor=0))
+
+    assert fetcher.get_tsv_data("road_eqr_carpda") is not None
+    assert len(server.requests) == 3
+    assert output.read_bytes() == TSV
+
+
+def test_503_beyond_retries_fails_without_touching_the_file(server, tmp_path):
+    server.failures_left = 10
+    output = tmp_path / "car_stat.txt"
+    output.write_bytes(b"old")
+    fetcher = EurostatDataFetcher(str(output), server.base_url,
+                                  session=create_session(pool_size=1, retries=1, backoff_factor=0))
+
+    assert fetcher.get_tsv_data("road_eqr_carpda") is None
+    assert fetcher.error
+    assert output.read_bytes() == b"old"
+
+
+def test_batch_fetches_concurrently_over_one_session(server, tmp_path):
+    server.delay = 0.3
+    datasets = ["road_eqr_carpda", "road_eqr_carmot", "road_eqr_busmot", "road_eqr_lormot"]
+    fetcher = EurostatBatchFetcher(str(tmp_path), server.base_url, max_workers=4, retries=0)
+
+    start = time.perf_counter()
+    results = fetcher.fetch(datasets + datasets[:1])
+    elapsed = time.perf_counter() - start
+
+    assert [result["dataset"] for result in results] == datasets
+    assert all(result["status"] == "downloaded" and result["bytes"] == len(TSV) for result in results)
+    assert server.max_active > 1
+    assert elapsed < server.delay * len(datasets)
+    assert all((tmp_path / f"{dataset}.tsv").read_bytes() == TSV for dataset in datasets)
+
+
+def test_batch_reports_each_dataset_status(server, tmp_path):
+    fetcher = EurostatBatchFetcher(str(tmp_path), server.base_url, max_workers=1, retries=0)
+    assert [result["status"] for result in fetcher.fetch(["road_eqr_carpda"])] == ["downloaded"]
+    server.failures_left = 1
+
+    results = fetcher.fetch(["road_eqr_carmot", "road_eqr_carpda"])
+
+    assert [result["status"] for result in results] == ["error", "not_modified"]
+    assert results[0]["error"]
+    assert results[1]["bytes"] == 0
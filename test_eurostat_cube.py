@@ -0,0 +1,91 @@
+import numpy as np
+import pytest
+from utils.eurostat_cube import EurostatCube, EurostatTable
+
+TSV = ("freq,unit,mot_nrg,geo\\TIME_PERIOD\t2021 \t2022 \t2023 \r\r\n"
+       "A,NR,ELC,PL\t100 \t: \t300 p\r\r\n"
+       "A,NR,ELC,DE\t1000 e\t: c\t:\r\r\n"
+       "A,NR,PET,PL\t5 \t6 s\r\r\n"
+       "A,PC,ELC,PL\t1 \t2 \t3 \r\r\n"
+       "Q,NR,ELC,PL\t7 \t8 \t9 \r\r\n")
+
+
+def write(tmp_path, text):
+    path = tmp_path / "car_stat.txt"
+    path.write_bytes(text.encode("utf-8"))
+    return str(path)
+
+
+@pytest.fixture
+def table(tmp_path):
+    return EurostatTable.from_tsv(write(tmp_path, TSV))
+
+
+@pytest.fixture
+def cube(table):
+    return EurostatCube.from_table(table)
+
+
+def test_table_parses_values_missing_and_flags(table):
+    assert table.dimensions == ["freq", "unit", "mot_nrg", "geo"]
+    assert table.years.tolist() == [2021, 2022, 2023]
+    assert table.column("geo").tolist() == ["PL", "DE", "PL", "PL", "PL"]
+    assert table.missing[:2].tolist() == [[False, True, False], [False, True, True]]
+    assert table.values[0].tolist() == [100, 0, 300]
+    assert table.flags[:2].tolist() == [["", "", "p"], ["e", "c", ""]]
+
+
+def test_short_rows_are_padded_as_missing(table):
+    assert table.values[2].tolist() == [5, 6, 0]
+    assert table.missing[2].tolist() == [False, False, True]
+    assert table.flags[2].tolist() == ["", "s", ""]
+
+
+@pytest.mark.parametrize("text", ["", "\r\r\n", "freq,unit,mot_nrg,geo\\TIME_PERIOD\t2021 \t2022 \r\r\n"])
+def test_empty_or_header_only_file_is_rejected(tmp_path, text):
+    with pytest.raises(ValueError, match="Empty Eurostat file"):
+        EurostatTable.from_tsv(write(tmp_path, text))
+
+
+def test_cube_keeps_only_the_requested_freq_and_unit(table):
+    cube = EurostatCube.from_table(table)
+    assert cube.mot_nrg == ["ELC", "PET"]
+    assert cube.geo == ["DE", "PL"]
+    assert cube.select("ELC", ["PL"]).tolist() == [[100, None, 300]]
+
+    percent = EurostatCube.from_table(table, unit="PC")
+    assert percent.geo == ["PL"]
+    assert percent.select("ELC", ["PL"]).tolist() == [[1, 2, 3]]
+    assert EurostatCube.from_table(table, freq="Q").select("ELC", ["PL"]).tolist() == [[7, 8, 9]]
+
+
+def test_cube_cells_without_a_row_are_missing(cube):
+    assert cube.select("PET", ["DE", "PL"]).tolist() == [[None, None, None], [5, 6, None]]
+
+
+def test_select_and_flags_follow_the_requested_order(cube):
+    selected = cube.select("ELC", ["PL", "DE"], [2023, 2021])
+    assert selected.tolist() == [[300, 100], [None, 1000]]
+    assert cube.select_flags("ELC", ["PL", "DE"], [2023, 2022]).tolist() == [["p", ""], ["", "c"]]
+
+
+@pytest.mark.parametrize("mot_nrg, geos, years", [
+    ("ELC", ["XX"], None),
+    ("ELC", ["PL"], [1999]),
+    ("HYD", ["PL"], None),
+])
+def test_unknown_geo_energy_or_year_is_fully_masked(cube, mot_nrg, geos, years):
+    selected = cube.select(mot_nrg, geos, years)
+    assert selected.shape == (1, 3 if years is None else 1)
+    assert np.ma.getmaskarray(selected).all()
+    assert set(cube.select_flags(mot_nrg, geos, years).ravel().tolist()) == {""}
+
+
+def test_unknown_entries_do_not_hide_known_ones(cube):
+    selected = cube.select("ELC", ["XX", "PL"], [2021, 1999])
+    assert selected.tolist() == [[None, None], [100, None]]
+    assert cube.select_flags("ELC", ["XX", "DE"], [2022, 1999]).tolist() == [["", ""], ["c", ""]]
+
+
+def test_to_dict_fills_missing_with_zero(cube):
+    assert cube.to_dict("ELC", start_year=2022) == {"DE": [0, 0], "PL": [0, 300]}
@@ -0,0 +1,52 @@
+import numpy as np
+import pytest
+from utils.eurostat_cube import EurostatCube, EurostatTable
+from utils.eurostat_export import export_table, load_table
+
+TSV = ("freq,unit,mot_nrg,geo\\TIME_PERIOD\t2021 \t2022 \t2023 \r\r\n"
+       "A,NR,ELC,PL\t100 \t: \t300 p\r\r\n"
+       "A,NR,ELC,DE\t1000 e\t2000 \t: \r\r\n"
+       "A,NR,PET,PL\t5 \t6 s\t7 \r\r\n")
+
+
+@pytest.fixture
+def table(tmp_path):
+    path = tmp_path / "car_stat.txt"
+    path.write_bytes(TSV.encode("utf-8"))
+    return EurostatTable.from_tsv(str(path))
+
+
+def assert_same_table(loaded, table):
+    assert loaded.dimensions == table.dimensions
+    assert loaded.labels.tolist() == table.labels.tolist()
+    assert loaded.years.tolist() == table.years.tolist()
+    assert loaded.missing.tolist() == table.missing.tolist()
+    np.testing.assert_array_equal(np.where(loaded.missing, 0, loaded.values), np.where(table.missing, 0, table.values))
+    assert loaded.flags.tolist() == table.flags.tolist()
+
+
+@pytest.mark.parametrize("extension", ["npz", "parquet"])
+def test_round_trip(table, tmp_path, extension):
+    if extension == "parquet":
+        pytest.importorskip("pyarrow")
+    path = str(tmp_path / f"car_stat.{extension}")
+
+    assert export_table(table, path) == path
+    loaded = load_table(path)
+
+    assert_same_table(loaded, table)
+    assert loaded.flags.tolist() == [["", "", "p"], ["e", "", ""], ["", "s", ""]]
+    cube = EurostatCube.from_table(loaded)
+    assert cube.select("ELC", ["PL"]).tolist() == [[100, None, 300]]
+
+
+def test_round_trip_of_the_bundled_dataset(tmp_path):
+    table = EurostatTable.from_tsv("resources/car_stat.txt")
+    path = str(tmp_path / "car_stat.npz")
+    assert_same_table(load_table(export_table(table, path)), table)
+
+
+def test_unsupported_extension_leaves_no_file(table, tmp_path):
+    with pytest.raises(ValueError):
+        export_table(table, str(tmp_path / "car_stat.csv"))
+    assert list(tmp_path.iterdir()) == [tmp_path / "car_stat.txt"]
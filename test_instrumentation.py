@@ -0,0 +1,87 @@
+import json
+import pytest
+from utils.instrumentation import Instrumentation, JsonLinesSink, MemorySink
+
+
+@pytest.fixture
+def sink():
+    return MemorySink()
+
+
+@pytest.fixture
+def tracer(sink):
+    tracer = Instrumentation()
+    tracer.configure(sink)
+    return tracer
+
+
+def test_span_emits_a_record_and_observes_its_duration(tracer, sink):
+    with tracer.span("parse", path="car_stat.txt") as span:
+        span.set(rows=3)
+
+    [record] = sink.records
+    assert record["kind"] == "span" and record["name"] == "parse"
+    assert record["path"] == "car_stat.txt" and record["rows"] == 3
+    assert record["duration_ms"] >= 0
+    assert tracer.snapshot()["histograms"]["parse"]["count"] == 1
+
+
+def test_span_records_the_error_and_lets_it_through(tracer, sink):
+    with pytest.raises(KeyError):
+        with tracer.span("lookup"):
+            raise KeyError("PL")
+    assert sink.records[0]["error"] == "KeyError"
+
+
+def test_counters_histograms_and_flush(tracer, sink):
+    tracer.count("cache.hit")
+    tracer.count("cache.hit", 2)
+    for value in (1.0, 3.0, 8.0):
+        tracer.observe("render_ms", value)
+
+    snapshot = tracer.snapshot()
+    assert snapshot["counters"] == {"cache.hit": 3}
+    assert snapshot["histograms"]["render_ms"] == {"count": 3, "mean": 4.0, "min": 1.0, "max": 8.0}
+
+    tracer.flush()
+    [summary] = sink.records
+    assert summary["kind"] == "summary"
+    assert summary["counters"] == snapshot["counters"] and summary["histograms"] == snapshot["histograms"]
+
+    tracer.reset()
+    assert tracer.snapshot() == {"counters": {}, "histograms": {}}
+
+
+def test_event_keeps_its_fields(tracer, sink):
+    tracer.event("graph.failed", error="ValueError")
+    assert sink.records[0]["kind"] == "event"
+    assert sink.records[0]["name"] == "graph.failed" and sink.records[0]["error"] == "ValueError"
+    assert "ts" in sink.records[0]
+
+
+def test_disabled_records_nothing(sink):
+    tracer = Instrumentation()
+    with tracer.span("parse"):
+        pass
+    tracer.count("cache.hit")
+    tracer.observe("render_ms", 1.0)
+    tracer.event("graph.failed")
+    tracer.flush()
+    assert tracer.snapshot() == {"counters": {}, "histograms": {}}
+
+    tracer.configure(sink)
+    tracer.configure(None)
+    tracer.event("graph.failed")
+    assert not tracer.enabled and sink.records == []
+
+
+def test_configure_from_spec(tmp_path):
+    tracer = Instrumentation()
+    tracer.configure_from_spec("")
+    assert not tracer.enabled
+
+    path = tmp_path / "trace.jsonl"
+    tracer.configure_from_spec(f"jsonl:{path}")
+    assert isinstance(tracer.sink, JsonLinesSink)
+    tracer.event("map.saved", path="map.html")
+    assert json.loads(path.read_text(encoding="utf-8"))["name"] == "map.saved"
@@ -0,0 +1,59 @@
+import numpy as np
+import pytest
+from utils.station_index import StationIndex, haversine_km
+
+
+@pytest.fixture
+def stations():
+    rng = np.random.default_rng(0)
+    latitudes = np.concatenate([rng.uniform(49.0, 54.8, 2000), rng.uniform(-10, 10, 300)])
+    # Poland plus a cluster on both sides of the antimeridian.
+    longitudes = np.concatenate([rng.uniform(14.1, 24.1, 2000), (rng.uniform(170, 190, 300) + 180) % 360 - 180])
+    return latitudes, longitudes
+
+
+def brute_force_radius(latitudes, longitudes, lat, lon, radius_km):
+    distances = haversine_km(lat, lon, latitudes, longitudes)
+    return set(np.flatnonzero(distances <= radius_km).tolist())
+
+
+@pytest.mark.parametrize("lat, lon, radius_km", [(52.2, 21.0, 25), (50.0, 19.9, 120), (0.0, 180.0, 400),
+                                                 (3.0, -179.5, 150), (60.0, 0.0, 10)])
+def test_within_radius_matches_brute_force(stations, lat, lon, radius_km):
+    index = StationIndex(*stations)
+    indices, distances = index.within_radius(lat, lon, radius_km)
+
+    assert set(indices.tolist()) == brute_force_radius(*stations, lat, lon, radius_km)
+    assert np.all(np.diff(distances) >= 0)
+
+
+@pytest.mark.parametrize("lat, lon", [(52.2, 21.0), (0.0, 179.9), (0.0, -179.9), (-60.0, 0.0)])
+def test_nearest_matches_brute_force(stations, lat, lon):
+    index = StationIndex(*stations)
+    indices, distances = index.nearest(lat, lon, k=7)
+
+    expected = np.sort(haversine_km(lat, lon, *stations))[:7]
+    np.testing.assert_allclose(distances, expected)
+    np.testing.assert_allclose(haversine_km(lat, lon, stations[0][indices], stations[1][indices]), distances)
+
+
+def test_nearest_on_a_small_or_empty_index():
+    assert len(StationIndex([], []).nearest(52.0, 21.0, k=3)[0]) == 0
+    indices, _ = StationIndex([52.0, 50.0], [21.0, 19.0]).nearest(0.0, 0.0, k=5)
+    assert sorted(indices.tolist()) == [0, 1]
+
+
+@pytest.mark.parametrize("south, west, north, east", [(51.0, 19.0, 52.5, 21.5), (-5.0, 175.0, 5.0, -175.0),
+                                                      (-10.0, 170.0, 10.0, 190.0), (-90.0, -180.0, 90.0, 180.0)])
+def test_within_bbox_matches_brute_force(stations, south, west, north, east):
+    latitudes, longitudes = stations
+    index = StationIndex(latitudes, longitudes)
+
+    west, east = (west + 180) % 360 - 180, (east + 180) % 360 - 180 if east - west < 360 else 180
+    if west <= east:
+        in_lon = (longitudes >= west) & (longitudes <= east)
+    else:
+        in_lon = (longitudes >= west) | (longitudes <= east)
+    expected = np.flatnonzero((latitudes >= south) & (latitudes <= north) & in_lon)
+    assert sorted(index.within_bbox(south, west, north, east).tolist()) == expected.tolist()
+    assert len(expected) > 0
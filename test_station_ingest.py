@@ -0,0 +1,104 @@
+import pytest
+from utils.station_ingest import StationIngest, normalize_address
+from utils.station_store import StationStore
+
+LINES = [
+    "52.2297 21.0122 Marszałkowska 1, 00-001 Warszawa",
+    "19.9450 50.0647 Rynek Główny 1, 31-042 Kraków",
+    "10.0000 10.0000 Somewhere else",
+    "95.0000 21.0000 Bad latitude",
+    "52.0000 200.0000 Bad longitude",
+    "52.229700001 21.012200004 marszałkowska 1 ,00 - 001  Warszawa",
+    "not a number",
+    "",
+    "54.3520 18.6466 Długi Targ 1, 80-830 Gdańsk",
+]
+
+
+@pytest.fixture
+def station_file(tmp_path):
+    path = tmp_path / "stacje.txt"
+    path.write_text("\n".join(LINES) + "\n", encoding="utf-8")
+    return str(path)
+
+
+def test_rows_swaps_rejects_and_deduplicates(station_file):
+    ingest = StationIngest(chunk_size=3)
+    rows = list(ingest.rows(station_file))
+
+    assert [row[:2] for row in rows] == [(52.2297, 21.0122), (50.0647, 19.9450), (54.3520, 18.6466)]
+    assert rows[0][2] == "Marszałkowska 1, 00-001 Warszawa"
+    assert ingest.accepted == 3
+    assert ingest.swapped == 1
+    assert dict(ingest.rejected) == {"outside_bounds": 1, "out_of_range": 2, "duplicate": 1, "unparsable": 1}
+    assert [(line_no, reason) for line_no, reason, _ in ingest.samples] == [
+        (3, "outside_bounds"), (4, "out_of_range"), (5, "out_of_range"), (6, "duplicate"), (7, "unparsable")]
+
+
+def test_rejected_rows_are_written_as_tsv(station_file, tmp_path):
+    rejected_path = tmp_path / "rejected.tsv"
+    list(StationIngest(rejected_path=str(rejected_path)).rows(station_file))
+
+    lines = rejected_path.read_text(encoding="utf-8").splitlines()
+    assert lines[0] == "line\treason\ttext"
+    assert sorted(line.split("\t")[1] for line in lines[1:]) == [
+        "duplicate", "out_of_range", "out_of_range", "outside_bounds", "unparsable"]
+
+
+def test_custom_and_disabled_bounds(station_file):
+    africa = StationIngest(bounds=(0.0, 0.0, 20.0, 20.0))
+    assert [row[:2] for row in africa.rows(station_file)] == [(10.0, 10.0)]
+    assert africa.rejected["outside_bounds"] == 4
+
+    anywhere = StationIngest(bounds=None)
+    assert len(list(anywhere.rows(station_file))) == 4
+    assert anywhere.swapped == 0
+    assert anywhere.rejected["outside_bounds"] == 0
+
+
+def test_normalize_address():
+    assert normalize_address("Długa 5 ,00 – 950  Warszawa") == "Długa 5, 00-950 Warszawa"
+    assert normalize_address("Długa 5, 00-950 Warszawa") == "Długa 5, 00-950 Warszawa"
+
+
+def test_store_build_passes_bounds(station_file, tmp_path):
+    store_path = str(tmp_path / "stacje.store")
+    ingest = StationStore.build(station_file, store_path, bounds=None)
+    store = StationStore.open(store_path)
+    try:
+        assert len(store) == ingest.accepted == 4
+        assert list(store.labels)[2] == "Somewhere else"
+    finally:
+        store.close()
+
+
+def test_inverted_bounds_are_rejected():
+    with pytest.raises(ValueError):
+        StationIngest(bounds=(60.0, 10.0, 40.0, 30.0))
+    with pytest.raises(ValueError):
+        StationIngest(bounds=(40.0, 30.0, 60.0, 10.0))
+
+
+def test_store_load_rebuilds_when_bounds_change(station_file, tmp_path):
+    store_path = str(tmp_path / "stacje.store")
+    StationStore.build(station_file, store_path, bounds=(0.0, 0.0, 20.0, 20.0))
+
+    store = StationStore.load(station_file, store_path)
+    try:
+        assert len(store) == 3
+    finally:
+        store.close()
+    store = StationStore.load(station_file, store_path, bounds=None)
+    try:
+        assert len(store) == 4
+    finally:
+        store.close()
+
+
+def test_cli_ingest_fails_without_accepted_stations(station_file, capsys):
+    from cli import main
+
+    assert main(["ingest", "--stations", station_file]) == 0
+    assert main(["ingest", "--stations", station_file, "--bounds", "60", "10", "40", "30"]) == 1
+    assert main(["ingest", "--stations", station_file, "--bounds", "-60", "-60", "-50", "-50"]) == 1
+    assert "0 stations accepted" in capsys.readouterr().out
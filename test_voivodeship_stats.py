@@ -0,0 +1,61 @@
+import numpy as np
+import pytest
+from data.voivodeships import Voivodeships
+from utils import voivodeship_stats
+from utils.voivodeship_stats import Region, load_regions
+
+# An L-shaped outline with a square hole, plus a separate island.
+L_SHAPE = [[0, 0], [4, 0], [4, 1], [1, 1], [1, 4], [0, 4], [0, 0]]
+HOLE = [[0.25, 0.25], [0.75, 0.25], [0.75, 0.75], [0.25, 0.75], [0.25, 0.25]]
+ISLAND = [[6, 6], [7, 6], [7, 7], [6, 7], [6, 6]]
+
+
+def feature(geometry_type, coordinates):
+    return {"type": "Feature", "properties": {}, "geometry": {"type": geometry_type, "coordinates": coordinates}}
+
+
+def ray_casting(rings, x, y):
+    """Per-point even-odd reference."""
+    inside = False
+    for ring in rings:
+        for (x0, y0), (x1, y1) in zip(ring, ring[1:] + ring[:1]):
+            if (y0 > y) != (y1 > y) and x < x0 + (y - y0) * (x1 - x0) / (y1 - y0):
+                inside = not inside
+    return inside
+
+
+@pytest.fixture
+def points():
+    rng = np.random.default_rng(0)
+    return rng.uniform(-1, 8, 5000), rng.uniform(-1, 8, 5000)
+
+
+@pytest.mark.parametrize("max_pairs", [2 ** 22, 7])
+def test_contains_matches_ray_casting(monkeypatch, points, max_pairs):
+    monkeypatch.setattr(voivodeship_stats, "_MAX_PAIRS", max_pairs)
+    region = Region("test", feature("MultiPolygon", [[L_SHAPE, HOLE], [ISLAND]]))
+    longitudes, latitudes = points
+
+    expected = [ray_casting([L_SHAPE, HOLE, ISLAND], x, y) for x, y in zip(longitudes, latitudes)]
+    assert region.contains(longitudes, latitudes).tolist() == expected
+
+
+def test_contains_single_polygon():
+    region = Region("test", feature("Polygon", [L_SHAPE, HOLE]))
+    longitudes = np.array([0.5, 2.0, 2.0, 0.1, 6.5, -1.0])
+    latitudes = np.array([0.5, 0.5, 2.0, 3.0, 6.5, 0.5])
+
+    assert region.contains(longitudes, latitudes).tolist() == [False, True, False, True, False, False]
+    assert region.contains(np.empty(0), np.empty(0)).tolist() == []
+
+
+def test_bundled_boundaries_cover_poland():
+    regions = load_regions(Voivodeships())
+    assert sorted(region.name for region in regions) == sorted(Voivodeships().get_voivodeships_list())
+
+    # Warsaw, Kraków and Gdańsk.
+    longitudes = np.array([21.012, 19.945, 18.646])
+    latitudes = np.array([52.230, 50.065, 54.352])
+    names = [[region.name for region in regions if region.contains(longitudes[i:i + 1], latitudes[i:i + 1])[0]]
+             for i in range(3)]
+    assert names == [["mazowieckie"], ["małopolskie"], ["pomorskie"]]
@@ -0,0 +1,144 @@
+import json
+import numpy as np
+from data.voivodeships import Voivodeships
+from utils.instrumentation import instrumentation
+
+KM_PER_DEG_LAT = 110.574
+KM_PER_DEG_LON = 111.320
+# Upper bound on (edge, point) pairs evaluated at once by the crossing test.
+_MAX_PAIRS = 2 ** 22
+_NAME_PROPERTIES = ("nazwa", "name", "JPT_NAZWA_", "NAME_1")
+
+
+class Region:
+    """One voivodeship boundary flattened into edge arrays for the crossing test."""
+
+    def __init__(self, name, feature):
+        self.name = name
+        self.feature = feature
+
+        geometry = feature["geometry"]
+        coordinates = geometry["coordinates"] if geometry["type"] == "MultiPolygon" else [geometry["coordinates"]]
+        polygons = [[np.asarray(ring, dtype=np.float64)[:, :2] for ring in polygon] for polygon in coordinates]
+        rings = [ring for polygon in polygons for ring in polygon]
+
+        starts = np.concatenate(rings)
+        ends = np.concatenate([np.roll(ring, -1, axis=0) for ring in rings])
+        self.bbox = (starts[:, 0].min(), starts[:, 1].min(), starts[:, 0].max(), starts[:, 1].max())
+        # Horizontal edges never cross a horizontal ray, so they are dropped up front.
+        sloped = starts[:, 1] != ends[:, 1]
+        starts, ends = starts[sloped], ends[sloped]
+        self.__x0, self.__y0 = starts[:, 0], starts[:, 1]
+        self.__slope = (ends[:, 0] - starts[:, 0]) / (ends[:, 1] - starts[:, 1])
+        self.__y_low = np.minimum(starts[:, 1], ends[:, 1])
+        self.__y_high = np.maximum(starts[:, 1], ends[:, 1])
+
+        # The first ring of each polygon is the outline, the rest are holes.
+        self.area_km2 = float(sum(self.__ring_area_km2(polygon[0]) - sum(map(self.__ring_area_km2, polygon[1:]))
+                                  for polygon in polygons))
+
+    def contains(self, longitudes, latitudes):
+        """Boolean mask of the points inside the region (even-odd rule, bbox prefiltered).
+
+        Candidates are sorted by latitude, so every edge is paired only with
+        the points in its latitude span, found with one searchsorted call.
+        """
+        min_lon, min_lat, max_lon, max_lat = self.bbox
+        inside = np.zeros(len(longitudes), dtype=bool)
+        candidates = np.flatnonzero((longitudes >= min_lon) & (longitudes <= max_lon)
+                                    & (latitudes >= min_lat) & (latitudes <= max_lat))
+        candidates = candidates[np.argsort(latitudes[candidates], kind="stable")]
+        x = longitudes[candidates]
+        y = latitudes[candidates]
+
+        first = np.searchsorted(y, self.__y_low, side="left")
+        counts = np.searchsorted(y, self.__y_high, side="left") - first
+        totals = np.cumsum(counts)
+        crossings = np.zeros(len(candidates), dtype=np.int64)
+
+        edge = 0
+        while edge < len(counts):
+            # Take as many edges as fit in _MAX_PAIRS, but always at least one.
+            done = totals[edge - 1] if edge else 0
+            stop = max(edge + 1, int(np.searchsorted(totals, done + _MAX_PAIRS, side="right")))
+            block_counts = counts[edge:stop]
+            edges = np.repeat(np.arange(edge, stop), block_counts)
+            positions = (np.arange(len(edges)) - np.repeat(np.cumsum(block_counts) - block_counts, block_counts)
+                         + first[edges])
+            crossing_x = self.__x0[edges] + (y[positions] - self.__y0[edges]) * self.__slope[edges]
+            crossings += np.bincount(positions[x[positions] < crossing_x], minlength=len(candidates))
+            edge = stop
+
+        inside[candidates] = crossings % 2 == 1
+        return inside
+
+    @staticmethod
+    def __ring_area_km2(ring):
+        x = ring[:, 0] * KM_PER_DEG_LON * np.cos(np.radians(ring[:, 1].mean()))
+        y = ring[:, 1] * KM_PER_DEG_LAT
+        return abs(np.dot(x, np.roll(y, -1)) - np.dot(y, np.roll(x, -1))) / 2
+
+
+class VoivodeshipStats:
+    """Station counts and density per voivodeship.
+
+    Each station is tested only against the regions whose bounding box
+    contains it, and stations already assigned are not tested again.
+    """
+
+    def __init__(self, regions, assignments):
+        self.regions = regions
+        self.assignments = assignments
+        self.counts = np.bincount(assignments[assignments >= 0], minlength=len(regions))
+        self.unassigned = int(np.count_nonzero(assignments < 0))
+
+    @classmethod
+    def compute(cls, latitudes, longitudes, boundaries_path=None):
+        voivodeships = Voivodeships(boundaries_path) if boundaries_path else Voivodeships()
+        regions = load_regions(voivodeships)
+        latitudes = np.asarray(latitudes, dtype=np.float64)
+        longitudes = np.asarray(longitudes, dtype=np.float64)
+
+        with instrumentation.span("voivodeship_stats", stations=len(latitudes), regions=len(regions)):
+            assignments = np.full(len(latitudes), -1, dtype=np.int64)
+            for i, region in enumerate(regions):
+                pending = np.flatnonzero(assignments < 0)
+                hits = region.contains(longitudes[pending], latitudes[pending])
+                assignments[pending[hits]] = i
+        return cls(regions, assignments)
+
+    def rows(self):
+        """One dict per voivodeship: name, stations, area_km2 and stations per 1000 km²."""
+        return [{
+            "name": region.name,
+            "stations": int(count),
+            "area_km2": round(region.area_km2, 1),
+            "density": round(1000 * count / region.area_km2, 3) if region.area_km2 else 0.0,
+        } for region, count in zip(self.regions, self.counts.tolist())]
+
+    def to_geojson(self):
+        """FeatureCollection of the boundaries with the aggregated values added to the properties."""
+        features = []
+        for region, row in zip(self.regions, self.rows()):
+            features.append({
+                "type": "Feature",
+                "geometry": region.feature["geometry"],
+                "properties": row,
+            })
+        return {"type": "FeatureCollection", "features": features}
+
+
+def load_regions(voivodeships):
+    with open(voivodeships.boundaries_path, "r", encoding="utf-8") as f:
+        collection = json.load(f)
+
+    regions = []
+    for feature in collection["features"]:
+        properties = feature.get("properties") or {}
+        raw_name = next((properties[key] for key in _NAME_PROPERTIES if key in properties), "")
+        name = voivodeships.match_name(raw_name)
+        if name is None:
+            instrumentation.event("regions.skipped", path=voivodeships.boundaries_path, name=raw_name)
+            continue
+        regions.append(Region(name, feature))
+    return regions
@@ -1,11 +1,20 @@
 class Voivodeships:
-    def __init__(self):
+    # Bundled as wojewodztwa.geojson; its "source" and "license" members say where the outlines come from.
+    def __init__(self, boundaries_path="resources/wojewodztwa.geojson"):
         self.__voivodeships = [
             "dolnośląskie", "kujawsko-pomorskie", "lubelskie", "lubuskie",
             "łódzkie", "małopolskie", "mazowieckie", "opolskie",
             "podkarpackie", "podlaskie", "pomorskie", "śląskie",
             "świętokrzyskie", "warmińsko-mazurskie", "wielkopolskie", "zachodniopomorskie"
         ]
+        self.boundaries_path = boundaries_path
 
     def get_voivodeships_list(self):
         return self.__voivodeships
+
+    def match_name(self, name):
+        """Maps a boundary file name such as "Województwo Śląskie" to the list entry, or None."""
+        name = " ".join(str(name).lower().split())
+        if name.startswith("województwo "):
+            name = name[len("województwo "):]
+        return name if name in self.__voivodeships else None